@@ -0,0 +1,88 @@
+""" Unified entry point dispatching
+
+        python -m src <tool> [options]
+
+    to the cli of the respective tool, which is equivalent to invoking python -m
+    on its module, e.g.
+
+        python -m src auto_crop -d screenshots
+
+    Solely the module of the selected tool is being imported, whose heavy dependencies
+    such as cv2, numpy, tqdm and send2trash are in turn merely loaded once a code path
+    requires them, such that for instance the display of a tool's help doesn't import
+    OpenCV. The startup cost may be broken down by means of
+
+        python -X importtime -m src <tool> --help 2> importtime.log
+
+    which lists the cumulative import time of each module in microseconds, whereas the
+    adherence of all tools to the startup budget is being verified by
+
+        python -c "import doctest, src.__main__; doctest.testmod(src.__main__)" """
+
+from typing import List, Tuple
+import os
+import runpy
+import subprocess
+import sys
+
+
+TOOLS = {
+    'auto_crop': 'src.auto_crop',
+    'file_duplicate_remover': 'src.file_duplicate_remover',
+    'image_color_reduction': 'src.image_color_reduction',
+    'video_lag_stripper': 'src.video_lag_stripper',
+    'total_revenue_calculator': 'src.cryptocurrency.total_revenue_calculator',
+    'wallet_seed_generator': 'src.cryptocurrency.wallet_seed_generator'
+}
+
+HEAVY_DEPENDENCIES = ('cv2', 'numpy', 'tqdm', 'send2trash')
+
+# seconds the display of a tool's help may take at most, excluding the interpreter startup
+STARTUP_BUDGET = 0.3
+
+
+def main(argv=None):
+    """ Runs the module of the tool named by the first argument as __main__, passing
+        the remaining arguments on to it """
+
+    argv = sys.argv[1:] if argv is None else argv
+
+    if not argv or argv[0] in ('-h', '--help'):
+        print('usage: python -m src <tool> [options]\n\ntools:\n' + '\n'.join(f'  {tool}' for tool in TOOLS))
+        return
+    if argv[0] not in TOOLS:
+        sys.exit(f'Unknown tool {argv[0]}, choose one of {", ".join(TOOLS)}')
+
+    sys.argv = sys.argv[:1] + argv[1:]
+    runpy.run_module(TOOLS[argv[0]], run_name='__main__', alter_sys=True)
+
+
+def startup(tool: str) -> Tuple[float, List[str]]:
+    """ Displays the help of tool in a subprocess
+
+        Returns:
+            seconds taken by the import of the tool's module and the display of its help,
+            heavy dependencies having been loaded, the mere binding of lazily imported
+            ones by sys.modules not counting as such
+
+        >>> startups = {tool: startup(tool) for tool in TOOLS}
+        >>> {tool: loaded for tool, (_, loaded) in startups.items() if loaded}
+        {}
+        >>> {tool: seconds for tool, (seconds, _) in startups.items() if seconds > STARTUP_BUDGET}
+        {}
+    """
+
+    script = (
+        'import contextlib, io, sys, time, types\n'
+        'start = time.perf_counter()\n'
+        'from src.__main__ import HEAVY_DEPENDENCIES, main\n'
+        'with contextlib.redirect_stdout(io.StringIO()), contextlib.suppress(SystemExit):\n'
+        f'    main([{tool!r}, "--help"])\n'
+        'print(time.perf_counter() - start, *(name for name in HEAVY_DEPENDENCIES if type(sys.modules.get(name)) is types.ModuleType))'
+    )
+    seconds, *loaded = subprocess.run([sys.executable, '-c', script], cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))), stdout=subprocess.PIPE, check=True, universal_newlines=True).stdout.split()
+    return float(seconds), loaded
+
+
+if __name__ == '__main__':
+    main()
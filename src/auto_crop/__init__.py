@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import os
+from typing import Optional
+
+from src.utils import lazy_import
+
+cv2 = lazy_import('cv2')
+np = lazy_import('numpy')
+
+
+STD_THRESHOLD = 1.
+MIN_HEIGHT_RATIO = 0.25
+
+
+def row_stds(image: np.ndarray) -> np.ndarray:
+    """ Returns:
+            standard deviation of the values of each image row across all of its pixels
+            and channels, of shape (height, ) """
+
+    return image.reshape(len(image), -1).std(axis=1)
+
+
+def content_bands(stds: np.ndarray, std_threshold=STD_THRESHOLD) -> np.ndarray:
+    """ Determines the maximal runs of non-uniform rows, i.e. the ones whose standard
+        deviation reaches std_threshold
+
+        Returns:
+            (start, stop) row indices of shape (n_bands, 2)
+
+        >>> content_bands(np.array([0., 5., 5., 0., 0., 3., 0.]))
+        array([[1, 3],
+               [5, 6]])
+               """
+
+    is_content = np.concatenate(([False], stds >= std_threshold, [False]))
+    return np.flatnonzero(np.diff(is_content.astype(np.int8))).reshape(-1, 2)
+
+
+def largest_content_slice(image: np.ndarray, std_threshold=STD_THRESHOLD, min_height_ratio=MIN_HEIGHT_RATIO) -> Optional[slice]:
+    """ Args:
+            image: array of shape (height, width[, n_channels])
+            std_threshold: row standard deviation below which a row is considered uniform
+            min_height_ratio: fraction of the image height the content band has to surpass
+
+        Returns:
+            row slice of the highest band of non-uniform rows, None if there's no band
+            surpassing min_height_ratio, or if it spans the entire image and there's thus
+            nothing to be cropped """
+
+    bands = content_bands(row_stds(image), std_threshold)
+    if not len(bands):
+        return None
+
+    start, stop = bands[np.argmax(bands[:, 1] - bands[:, 0])]
+    if stop - start <= len(image) * min_height_ratio or stop - start == len(image):
+        return None
+    return slice(int(start), int(stop))
+
+
+def crop(image_file_path: str, write_path: str, std_threshold=STD_THRESHOLD, min_height_ratio=MIN_HEIGHT_RATIO) -> bool:
+    """ Writes image cropped to its largest content slice to write_path
+
+        Returns:
+            whether the image has been cropped, False if it couldn't be decoded or
+            there's no content slice to crop it to """
+
+    image = cv2.imread(image_file_path)
+    if image is None:
+        return False
+
+    content_slice = largest_content_slice(image, std_threshold=std_threshold, min_height_ratio=min_height_ratio)
+    if content_slice is None:
+        return False
+
+    return cv2.imwrite(write_path, image[content_slice])
+
+
+def get_write_path(original_path: str, write_dir_path: Optional[str]) -> str:
+    """ Returns:
+            png path of original file name extended by '_cropped', residing either in
+            write_dir_path if set or the directory of the original file otherwise """
+
+    file_name = os.path.splitext(os.path.basename(original_path))[0] + '_cropped.png'
+    return os.path.join(write_dir_path or os.path.dirname(original_path), file_name)
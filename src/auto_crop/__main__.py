@@ -1,55 +1,59 @@
+""" Crops images, e.g. screenshots, to their highest band of consecutive non-uniform rows,
+	thus removing uniformly colored bars, margins and the like above and below the actual
+	content. Images whose content band doesn't surpass a quarter of their height, or which
+	don't comprise any uniform rows at all, are skipped.
+	Original files will be left untouched while the cropped images will be written as png
+	to the directory, the former are residing in, unless a write dir path being passed.
+
+	In batch mode, the images residing in a directory are being cropped on --workers
+	processes, defaulting to the number of cpus, and written as cropped{n}.png to the write
+	directory, a manifest of the processed files kept within the latter causing reruns to
+	merely process added or modified images.
+
+	Refer to the bottom of this file in order to read up on the passable cli options. """
+
 import os
-from itertools import starmap
-
-import cv2
-import numpy as np
-
-
-croppingDir = 'C:/Users/User/Pictures/testScreens'
-destDir = 'C:/Users/User/Pictures/croppedScreenshotsTest'
-
-# creating saving destination dir if necessary
-latestFileInd = 0
-if not os.path.isdir(destDir):
-	os.makedirs(destDir)
-# if already existent retrieve latest cropImgInd
-else:
-	if len(os.listdir(destDir)):
-		filenames = [file[:file.rfind('.')] for file in os.listdir(destDir)]
-		latestFileInd = int(sorted(filenames)[-1][-1]) + 1
-
-oldDirSize = len(os.listdir(destDir))
-
-# iterating through files
-stdThresh = 1
-for fileInd, file in enumerate(os.listdir(croppingDir)):
-	imgLink = os.path.join(croppingDir, file)
-	arr = cv2.imread(imgLink)
-
-	sliceInds = [] 
-	currIndList = []
-
-	if not fileInd % 10:
-		print("current img ind: ", fileInd)
-	
-	for rowInd, row in enumerate(arr[:-1]):
-		if not len(currIndList):
-			if np.std(row) < stdThresh and np.std(arr[rowInd+1]):
-				currIndList.append(rowInd)
-		else:
-			if np.std(row) and np.std(arr[rowInd+1]) < stdThresh or rowInd+1 == len(arr)-1:
-				currIndList.append(rowInd)
-				sliceInds.append(tuple(currIndList))
-				currIndList = []
-	
-	sliceHeightList = list(starmap(lambda a, b: np.abs(a-b), sliceInds))
-	maxHeightInd = np.argmax(sliceHeightList)
-	maxGapTuple = sliceInds[maxHeightInd]
-
-	# save cropped image if surpassing 1/4 of original image height
-	if sliceHeightList[maxHeightInd] > (len(arr) / 4.0):
-		croppedImg = arr[maxGapTuple[0]+1:maxGapTuple[1]]
-		cv2.imwrite(os.path.join(destDir, f'cropped{latestFileInd}.png'), croppedImg)
-		latestFileInd += 1
-
-print(f"cropped {len(os.listdir(destDir))-oldDirSize} out of {len(os.listdir(croppingDir))} images")
\ No newline at end of file
+
+from src.auto_crop import crop, get_write_path, MIN_HEIGHT_RATIO, STD_THRESHOLD
+from src.auto_crop._batch import crop_batch
+
+
+def main(image_file_path: str):
+	write_path = get_write_path(image_file_path, WRITE_DIR_PATH)
+
+	if crop(image_file_path, write_path, std_threshold=STD_THRESHOLD, min_height_ratio=MIN_HEIGHT_RATIO):
+		print(f'Saved cropped image to {write_path}')
+	else:
+		print(f'Skipped {image_file_path}, either not being decodable or not comprising any content band to crop it to')
+
+
+if __name__ == '__main__':
+	from src.utils import directory_file_paths, parse_args, run
+
+	args = parse_args(
+		('-p', '--path', str, 'image path', None),
+		('-w', '--writedirpath', str, 'directory path cropped images shall be written to, defaults to dir original image residing at', None),
+		('-t', '--stdthreshold', float, 'standard deviation of the values of a row below which the latter is considered uniform', STD_THRESHOLD),
+		('-mh', '--minheightratio', float, 'fraction of the image height the content band has to surpass in order for the image to be cropped', MIN_HEIGHT_RATIO),
+		('-b', '--batch', bool, 'directory mode: crop images on --workers processes, defaulting to the number of cpus, skipping the ones processed by previous runs; requires write dir path', False),
+		include_dir_argument=True
+	)
+
+	FILE_PATH = args.path
+	DIRECTORY_PATH = args.dir
+	WRITE_DIR_PATH = args.writedirpath
+	STD_THRESHOLD = args.stdthreshold
+	MIN_HEIGHT_RATIO = args.minheightratio
+
+	if WRITE_DIR_PATH is not None:
+		os.makedirs(WRITE_DIR_PATH, exist_ok=True)
+
+	if args.batch:
+		if not (DIRECTORY_PATH and WRITE_DIR_PATH):
+			raise AttributeError('Batch mode requires both directory path and write dir path')
+
+		image_file_paths = directory_file_paths(DIRECTORY_PATH)
+		n_cropped, n_skipped = crop_batch(image_file_paths, WRITE_DIR_PATH, std_threshold=STD_THRESHOLD, min_height_ratio=MIN_HEIGHT_RATIO, n_workers=args.workers)
+		print(f'Cropped {n_cropped} out of {len(image_file_paths) - n_skipped} new or modified images, skipped {n_skipped} processed ones')
+	else:
+		run(main, file_path=FILE_PATH, directory_path=DIRECTORY_PATH)
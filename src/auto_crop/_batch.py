@@ -0,0 +1,112 @@
+""" Incremental cropping of entire directories, keeping a manifest of the processed files
+    within the write directory such that reruns merely process files which have been
+    added or modified since """
+
+from typing import Dict, List, Optional, Sequence, Tuple
+from concurrent.futures import ProcessPoolExecutor
+import json
+import os
+import re
+
+from src.auto_crop import crop, MIN_HEIGHT_RATIO, STD_THRESHOLD
+
+
+_OUTPUT_NAME_PATTERN = re.compile(r'cropped(\d+)\.png')
+
+
+class Manifest:
+    """ Maps processed image file paths, alongside their size and modification time at
+        processing, onto the names of their cropped versions, None for images which
+        haven't been cropped, and allocates output names of consecutive indices """
+
+    FILE_NAME = '.auto_crop_manifest.json'
+
+    def __init__(self, write_dir_path: str):
+        self._path: str = os.path.join(write_dir_path, self.FILE_NAME)
+        self._entries: Dict[str, dict] = {}
+        self._next_index: int = 0
+
+        if os.path.exists(self._path):
+            with open(self._path) as f:
+                manifest = json.load(f)
+            self._entries, self._next_index = manifest['files'], manifest['next_index']
+
+        # continue after the highest index of output files not being tracked, e.g. from
+        # runs preceding the manifest's introduction
+        for file_name in os.listdir(write_dir_path):
+            match = _OUTPUT_NAME_PATTERN.fullmatch(file_name)
+            if match:
+                self._next_index = max(self._next_index, int(match.group(1)) + 1)
+
+    @staticmethod
+    def _stat(path: str) -> Tuple[int, int]:
+        stat = os.stat(path)
+        return stat.st_size, stat.st_mtime_ns
+
+    def is_processed(self, path: str) -> bool:
+        entry = self._entries.get(path)
+        return entry is not None and (entry['size'], entry['mtime_ns']) == self._stat(path)
+
+    def output_name(self, path: str) -> str:
+        """ Returns:
+                output name the image has been written to before if it has been cropped,
+                newly allocated one otherwise """
+
+        previous_output_name = self._entries.get(path, {}).get('output')
+        if previous_output_name is not None:
+            return previous_output_name
+
+        self._next_index += 1
+        return f'cropped{self._next_index - 1}.png'
+
+    def record(self, path: str, output_name: Optional[str]):
+        size, mtime_ns = self._stat(path)
+        self._entries[path] = {'size': size, 'mtime_ns': mtime_ns, 'output': output_name}
+
+    def save(self):
+        """ Writes manifest to a temporary file first, which then replaces the existing
+            one, such that an interruption can't leave a corrupted manifest behind """
+
+        with open(self._path + '.tmp', 'w') as f:
+            json.dump({'next_index': self._next_index, 'files': self._entries}, f)
+        os.replace(self._path + '.tmp', self._path)
+
+
+def crop_batch(image_file_paths: Sequence[str], write_dir_path: str, std_threshold=STD_THRESHOLD, min_height_ratio=MIN_HEIGHT_RATIO, n_workers: Optional[int] = None) -> Tuple[int, int]:
+    """ Crops all images which haven't been processed in their current state before on
+        n_workers processes, allocating output names in the sorted order of the image file
+        paths prior to dispatching, which renders them deterministic as well as collision-free
+
+        Returns:
+            number of cropped images, number of images having been processed before """
+
+    manifest = Manifest(write_dir_path)
+
+    unprocessed_paths: List[str] = [path for path in sorted(map(os.path.abspath, image_file_paths)) if not manifest.is_processed(path)]
+    output_names = list(map(manifest.output_name, unprocessed_paths))
+
+    from tqdm import tqdm
+
+    n_cropped = 0
+    try:
+        with ProcessPoolExecutor(n_workers) as executor:
+            results = executor.map(
+                crop,
+                unprocessed_paths,
+                [os.path.join(write_dir_path, output_name) for output_name in output_names],
+                [std_threshold] * len(unprocessed_paths),
+                [min_height_ratio] * len(unprocessed_paths),
+                chunksize=max(len(unprocessed_paths) // (4 * (n_workers or os.cpu_count() or 1)), 1)
+            )
+
+            for path, output_name, cropped in tqdm(zip(unprocessed_paths, output_names, results), total=len(unprocessed_paths)):
+                manifest.record(path, output_name if cropped else None)
+                n_cropped += cropped
+
+                # remove outdated cropped version of modified image which isn't being cropped anymore
+                if not cropped and os.path.exists(os.path.join(write_dir_path, output_name)):
+                    os.remove(os.path.join(write_dir_path, output_name))
+    finally:
+        manifest.save()
+
+    return n_cropped, len(image_file_paths) - len(unprocessed_paths)
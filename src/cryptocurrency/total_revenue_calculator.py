@@ -1,9 +1,31 @@
-from typing import List, Sequence, Any, Iterator, Tuple
+from __future__ import annotations
+
+from typing import List, Sequence, Any, Iterator, Tuple, Dict, BinaryIO
+from collections import defaultdict
 
 import itertools
 import operator
 import enum
 
+from src.utils import lazy_import
+
+np = lazy_import('numpy')
+
+
+class OrderOrigin(enum.Enum):
+    ScaledOrderPreview = 0
+    OrderOverview = 1
+
+
+# number of columns, size column index, price column index
+_COLUMN_LAYOUTS = {OrderOrigin.ScaledOrderPreview: (3, 1, 2), OrderOrigin.OrderOverview: (6, 0, 2)}
+
+# time, type and status column indices of the order overview
+_TIME_COLUMN, _TYPE_COLUMN, _STATUS_COLUMN = 3, 4, 5
+
+# number of leading characters of the order overview time, e.g. '21-02-15 - 14:18:46', making up the time bucket
+TIME_BUCKET_WIDTHS = {'year': 2, 'month': 5, 'day': 8, 'hour': 13, 'none': 0}
+
 
 def scaled_order_preview_revenue(order: str) -> float:
     """
@@ -43,29 +65,199 @@ def _calculate(order: str, relevant_column_indices: List[int], total_columns: in
     return sum(itertools.starmap(operator.mul, map(lambda row: map(float, itertools.compress(row, selectors=selectors)), _chunk_iterator(order.split('\n'), chunk_size=total_columns))))
 
 
+def streamed_revenue(f: BinaryIO, order_origin: OrderOrigin, time_bucket='day', chunk_size=2 ** 20) -> Dict[Tuple[str, str, str], float]:
+    """ Aggregates the revenue of arbitrarily many orders, e.g. of entire order history
+        exports, reading chunk_size bytes at a time and converting them into rows by means
+        of numpy, without creating any per-cell python objects, such that memory consumption
+        is independent of the number of orders
+
+        Merely the size and price lines are being gathered and parsed, whereas the type,
+        status and time bucket columns are factorized separately into integer codes, whose
+        combination indexes the aggregated revenues
+
+        Args:
+            f: binary stream, e.g. an opened file or sys.stdin.buffer, of cells adhering to the
+                column structure of order_origin, one per line, blank lines being skipped
+            time_bucket: one of TIME_BUCKET_WIDTHS, determining the granularity of the
+                time bucketing of order overview revenues
+
+        Returns:
+            revenue per (type, status, time bucket), which are all empty for scaled order previews
+
+    >>> import io
+    >>> f = io.BytesIO(b'226.90799\\n226.90799\\n1.2000\\n21-02-15 - 14:18:46\\nSell\\nFilled\\n\\n453.81599\\n453.81599\\n1.3000\\n21-02-16 - 09:00:00\\nSell\\nFilled')
+    >>> dict(streamed_revenue(f, OrderOrigin.OrderOverview, time_bucket='month'))
+    {('Sell', 'Filled', '21-02'): 862.250375}
+    """
+
+    n_columns, size_column, price_column = _COLUMN_LAYOUTS[order_origin]
+    time_bucket_width = TIME_BUCKET_WIDTHS[time_bucket]
+
+    revenues = defaultdict(float)
+    remainder = b''
+    while True:
+        chunk = f.read(chunk_size)
+
+        # carry incomplete trailing line as well as lines of incomplete trailing row over to the next chunk
+        data = remainder + chunk
+        if chunk:
+            data, remainder = data[:data.rfind(b'\n') + 1], data[data.rfind(b'\n') + 1:]
+        else:
+            data += b'\n'
+
+        starts, ends = _cell_bounds(np.frombuffer(data, dtype=np.uint8))
+        n_rows = len(starts) // n_columns
+        if n_rows * n_columns < len(starts):
+            remainder = data[starts[n_rows * n_columns]:] + remainder
+
+        # zero pad data such that the cell gathering windows don't exceed it
+        buffer = np.frombuffer(data + bytes(int((ends - starts).max(initial=0)) + 1), dtype=np.uint8)
+
+        def column_bounds(column: int) -> Tuple[np.ndarray, np.ndarray]:
+            return _stripped_bounds(buffer, starts[column:n_rows * n_columns:n_columns], ends[column:n_rows * n_columns:n_columns])
+
+        chunk_revenues = _cells(buffer, *column_bounds(size_column)).astype(np.float64) * _cells(buffer, *column_bounds(price_column)).astype(np.float64)
+
+        if order_origin is OrderOrigin.ScaledOrderPreview:
+            revenues[(b'', b'', b'')] += chunk_revenues.sum()
+        elif n_rows:
+            time_starts, time_ends = column_bounds(_TIME_COLUMN)
+            factorizations = [
+                _factorized(_cells(buffer, *column_bounds(_TYPE_COLUMN))),
+                _factorized(_cells(buffer, *column_bounds(_STATUS_COLUMN))),
+                _factorized(_cells(buffer, time_starts, np.minimum(time_ends, time_starts + time_bucket_width)))
+            ]
+
+            # aggregate revenues by combined codes, comprising combinations of zero revenue as well
+            combined_codes = np.ravel_multi_index([codes for codes, _ in factorizations], [len(uniques) for _, uniques in factorizations])
+            n_combinations = int(np.prod([len(uniques) for _, uniques in factorizations]))
+
+            present_combinations = np.flatnonzero(np.bincount(combined_codes, minlength=n_combinations))
+            key_columns = [uniques[codes].tolist() for (_, uniques), codes in zip(factorizations, np.unravel_index(present_combinations, [len(uniques) for _, uniques in factorizations]))]
+            for key, revenue in zip(zip(*key_columns), np.bincount(combined_codes, weights=chunk_revenues, minlength=n_combinations)[present_combinations].tolist()):
+                revenues[key] += revenue
+
+        if not chunk:
+            return {tuple(cell.decode() for cell in key): revenue for key, revenue in revenues.items()}
+
+
+def _cell_bounds(buffer: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """ Args:
+            buffer: bytes of newline terminated lines
+
+        Returns:
+            start and end indices of the non-blank lines, i.e. the ones comprising any byte
+            above the space character, excluding the newlines
+
+    >>> _cell_bounds(np.frombuffer(b'1.5\\n \\n\\n Sell\\n', dtype=np.uint8))
+    (array([0, 7]), array([ 3, 12]))
+    """
+
+    ends = np.flatnonzero(buffer == ord('\n'))
+    starts = np.concatenate(([0], ends[:-1] + 1))[:len(ends)]
+
+    # lines commencing with a non-whitespace byte are non-blank, the few remaining non-empty
+    # ones having to be scanned entirely
+    non_blank = buffer[starts] > ord(' ')
+    scanned = np.flatnonzero(~non_blank & (ends > starts))
+    if len(scanned):
+        stripped_starts, stripped_ends = _stripped_bounds(buffer, starts[scanned], ends[scanned])
+        non_blank[scanned] = stripped_ends > stripped_starts
+
+    return starts[non_blank], ends[non_blank]
+
+
+def _stripped_bounds(buffer: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """ Returns:
+            starts and ends of the lines delimited by them, stripped of surrounding whitespace,
+            being moved one byte at a time, as cells are rarely padded
+
+    >>> _stripped_bounds(np.frombuffer(b'  Sell \\n', dtype=np.uint8), np.array([0]), np.array([7]))
+    (array([2]), array([6]))
+    """
+
+    starts, ends = starts.copy(), ends.copy()
+    while True:
+        leading = (starts < ends) & (buffer[starts] <= ord(' '))
+        if not leading.any():
+            break
+        starts[leading] += 1
+
+    while True:
+        trailing = (starts < ends) & (buffer[ends - 1] <= ord(' '))
+        if not trailing.any():
+            return starts, ends
+        ends[trailing] -= 1
+
+
+def _cells(buffer: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """ Args:
+            buffer: bytes being followed by at least as many zero bytes as the longest line
+                delimited by starts and ends comprises
+
+        Returns:
+            lines delimited by starts and ends as byte strings of the width of the longest one
+
+    >>> buffer = np.frombuffer(b'1.5\\n Sell\\n\\0\\0\\0\\0\\0', dtype=np.uint8)
+    >>> _cells(buffer, np.array([0, 4]), np.array([3, 9]))
+    array([b'1.5', b' Sell'], dtype='|S5')
+    """
+
+    lengths = ends - starts
+
+    # gather lines into rows of a matrix by means of a sliding window view onto the
+    # buffer, zeroing the bytes beyond each line's end
+    width = max(int(lengths.max(initial=0)), 1)
+    matrix = np.lib.stride_tricks.sliding_window_view(buffer, width)[starts]
+    matrix *= np.arange(width) < lengths[:, np.newaxis]
+
+    return matrix.view(f'S{width}').reshape(-1)
+
+
+def _factorized(cells: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """ Returns:
+            codes of shape (n_cells, ) indexing the sorted unique cells; cells of up to
+            eight bytes are being factorized by means of their integer representation
+
+    >>> _factorized(np.array([b'Sell', b'Buy', b'Sell']))
+    (array([1, 0, 1]), array([b'Buy', b'Sell'], dtype='|S4'))
+    """
+
+    if cells.itemsize > 8:
+        uniques, codes = np.unique(cells, return_inverse=True)
+        return codes.reshape(-1), uniques
+
+    # zero pad to eight big-endian bytes, whose integer order equals the byte string order
+    integers = np.zeros((len(cells), 8), dtype=np.uint8)
+    integers[:, :cells.itemsize] = cells.view(np.uint8).reshape(len(cells), cells.itemsize)
+    unique_integers, codes = np.unique(integers.view('>u8').reshape(-1), return_inverse=True)
+
+    return codes.reshape(-1), unique_integers.astype('>u8').view('S8').astype(cells.dtype)
+
+
 def _chunk_iterator(sequence: Sequence[Any], chunk_size: int) -> Iterator[Tuple[Any]]:
     return zip(*[iter(sequence)] * chunk_size)
 
 
 if __name__ == '__main__':
-    """ Execution steps:
-            - Replace order variable value by your order
-            - determine OrderOrigin
-            - run """
+    import sys
+
+    from src.utils import parse_args
 
+    args = parse_args(
+        ('-o', '--origin', str, f'origin of the order data determining its column structure, one of {[origin.name for origin in OrderOrigin]}', OrderOrigin.OrderOverview.name),
+        ('-f', '--file', str, 'path of file comprising the order data, one cell per line; read from stdin if not passed', None),
+        ('-t', '--timebucket', str, f'granularity of the order overview revenue aggregation, one of {list(TIME_BUCKET_WIDTHS)}', 'day'),
+        ('-c', '--chunksize', int, 'number of bytes being read and converted at once', 2 ** 20)
+    )
 
-    class OrderOrigin(enum.Enum):
-        ScaledOrderPreview = 0
-        OrderOverview = 1
+    ORDER_ORIGIN = OrderOrigin[args.origin]
 
+    with (open(args.file, 'rb') if args.file else sys.stdin.buffer) as f:
+        revenues = streamed_revenue(f, ORDER_ORIGIN, time_bucket=args.timebucket, chunk_size=args.chunksize)
 
-    # parameters to be modified
-    oder_origin = OrderOrigin.OrderOverview
-    order = """ 1
-            500.00000
-            10.0000
-            2
-            500.00000
-            5.0000 """
+    if ORDER_ORIGIN is OrderOrigin.OrderOverview:
+        for (order_type, status, time_bucket), revenue in sorted(revenues.items()):
+            print(f'{order_type} {status} {time_bucket}: {revenue}€')
 
-    print(f'Total Revenue: {[scaled_order_preview_revenue, closed_order_revenue][oder_origin.value()](order=order)}€')
+    print(f'Total Revenue: {sum(revenues.values())}€')
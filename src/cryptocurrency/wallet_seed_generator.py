@@ -1,9 +1,58 @@
+from typing import Iterator
+import os
 import string
-import random
 
 
 LENGTH = 81
-POOL = string.ascii_letters + '9'
+POOL = string.ascii_uppercase + '9'
 
+# bytes of value beyond the largest multiple of the pool size are rejected, such that
+# each pool character corresponds to an equal number of byte values and is thus
+# drawn with equal probability
+_N_ACCEPTED_BYTE_VALUES = 256 - 256 % len(POOL)
+_REJECTED_BYTES = bytes(range(_N_ACCEPTED_BYTE_VALUES, 256))
+_BYTE_2_CHARACTER = bytes(ord(POOL[value % len(POOL)]) for value in range(256))
 
-print(''.join([random.choice(POOL) for _ in range(LENGTH)]).upper())
+
+def random_characters(n: int) -> str:
+    """ Draws n characters uniformly from POOL by means of the operating system's
+        cryptographically secure random number generator, mapping random bytes onto
+        characters and discarding the rejected ones in bulk via bytes.translate
+
+        >>> len(random_characters(1000))
+        1000
+        """
+
+    characters = b''
+    while len(characters) < n:
+        # draw enough bytes to likely not require another draw, given the acceptance rate
+        n_missing = n - len(characters)
+        characters += os.urandom(n_missing * 256 // _N_ACCEPTED_BYTE_VALUES + 16).translate(_BYTE_2_CHARACTER, _REJECTED_BYTES)
+    return characters[:n].decode()
+
+
+def generate_seeds(n: int, length=LENGTH, batch_size=2 ** 12) -> Iterator[str]:
+    """ Yields:
+            n seeds of length characters, being drawn in batches of batch_size seeds """
+
+    for batch_start in range(0, n, batch_size):
+        n_batch_seeds = min(batch_size, n - batch_start)
+        characters = random_characters(n_batch_seeds * length)
+        yield from (characters[i:i + length] for i in range(0, len(characters), length))
+
+
+if __name__ == '__main__':
+    import sys
+
+    from src.utils import parse_args
+
+    args = parse_args(
+        ('-n', '--number', int, 'number of seeds to be generated', 1),
+        ('-l', '--length', int, 'number of characters per seed', LENGTH),
+        ('-o', '--output', str, 'path of file the seeds, one per line, shall be written to; printed if not passed', None),
+        ('-b', '--batchsize', int, 'number of seeds being generated at once', 2 ** 12)
+    )
+
+    with (open(args.output, 'w') if args.output else sys.stdout) as f:
+        for seed in generate_seeds(args.number, args.length, batch_size=args.batchsize):
+            f.write(seed + '\n')
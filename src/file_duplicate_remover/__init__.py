@@ -0,0 +1,131 @@
+import os
+import functools
+import itertools
+from collections import defaultdict
+from typing import Callable, Dict, Hashable, Iterator, List, NamedTuple, Sequence, Set, Tuple
+
+from src.file_duplicate_remover._devices import DeviceExecutors
+
+
+class IndexedFile(NamedTuple):
+    """ Serving the storage of the stat results retrieved throughout the directory walk """
+
+    path: str
+    size: int
+    inode: int
+    mtime_ns: int
+    device: int
+
+
+GroupKey = Tuple[Hashable, ...]
+FileIndex = Dict[GroupKey, List[IndexedFile]]
+
+# (offset, length) in byte
+ContentRange = Tuple[int, int]
+
+
+def by_name_and_size(file_name: str, size: int) -> GroupKey:
+    return file_name, size
+
+
+def by_size(_: str, size: int) -> GroupKey:
+    return size,
+
+
+def ungrouped(_: str, __: int) -> GroupKey:
+    """ Puts all files into a single group, thus preserving their global order of encounter,
+        as befits a subsequent regrouping by properties requiring file reads """
+
+    return ()
+
+
+def index_files(root_dir_paths: Sequence[str], file_extensions: Set[str], group_key: Callable[[str, int], GroupKey] = by_name_and_size) -> FileIndex:
+    """ Walks once through all file system objects residing with any depth under
+        root_dir_paths and groups the files which ought to be considered given their
+        extension, by default by file name with extension and size, whilst reusing the
+        stat results retrieved by os.scandir
+
+        Roots residing on distinct physical devices are walked concurrently, whereas the ones
+        residing on the same spinning disk are walked sequentially. Files encountered repeatedly,
+        e.g. due to nested roots or hard links, are indexed merely once
+
+        Args:
+            root_dir_paths: directories to be walked through, in descending priority
+            file_extensions: extensions without dot of files to be indexed
+            group_key: function of file name with extension and size in byte, returning
+                the key of the group the corresponding file shall be assigned to
+
+        Returns:
+            index mapping group keys onto the files of corresponding properties, ordered
+            by the priority of the roots they reside under and subsequently by order of
+            encounter, such that files residing under prioritized roots become reference copies """
+
+    with DeviceExecutors() as executors:
+        indexed_files_per_root = list(executors.map(functools.partial(_indexed_files, file_extensions=file_extensions), root_dir_paths, st_dev=lambda root_dir_path: os.stat(root_dir_path).st_dev))
+
+    index = defaultdict(list)
+    encountered_inodes = set()
+
+    for file in itertools.chain.from_iterable(indexed_files_per_root):
+        if file.inode and (file.device, file.inode) in encountered_inodes:
+            continue
+        encountered_inodes.add((file.device, file.inode))
+
+        index[group_key(os.path.basename(file.path), file.size)].append(file)
+
+    return index
+
+
+def _indexed_files(root_dir_path: str, file_extensions: Set[str]) -> List[IndexedFile]:
+    indexed_files = []
+
+    # the stat results of os.scandir lack the device on Windows, st_dev always being 0,
+    # whereas os.stat retrieves the volume serial number, hence falling back to the
+    # one of the root, mount points within which are a rarity on Windows
+    root_device = os.stat(root_dir_path).st_dev
+
+    for entry in _walk(root_dir_path):
+        if _file_extension(entry.name) in file_extensions:
+            stat = entry.stat(follow_symlinks=False)
+            indexed_files.append(IndexedFile(entry.path, stat.st_size, inode=entry.inode(), mtime_ns=stat.st_mtime_ns, device=stat.st_dev or root_device))
+
+    return indexed_files
+
+
+def _walk(dir_path: str) -> Iterator[os.DirEntry]:
+    """ Yields:
+            entries of files residing with any depth under dir_path, directories being
+            descended into in order of encounter; symbolic links are not followed """
+
+    with os.scandir(dir_path) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                yield from _walk(entry.path)
+            elif entry.is_file(follow_symlinks=False):
+                yield entry
+
+
+def duplicates(index: FileIndex) -> Iterator[Tuple[IndexedFile, IndexedFile]]:
+    """ Resolves duplicates per group, the first encountered file of each group
+        serving as reference copy, of which all group members residing in a
+        directory other than the reference file's parent directory are duplicates
+
+        Yields:
+            (reference file, duplicate) """
+
+    for reference_file, *candidates in index.values():
+        reference_dir_path = os.path.dirname(reference_file.path)
+
+        for candidate in candidates:
+            if os.path.dirname(candidate.path) != reference_dir_path:
+                yield reference_file, candidate
+
+
+def _file_extension(file_path: str) -> str:
+    """ Returns:
+            file extension without dot, e.g. 'mp3', 'wav' etc.
+
+        >>> _file_extension("C:\\Users\\User\\Music\\Flume\\B.I.G Flume (Album Mix) - YouTube.mp3")
+        'mp3' """
+
+    return os.path.splitext(file_path)[1][1:]
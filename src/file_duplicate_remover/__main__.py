@@ -1,133 +1,129 @@
 """ Identifies all duplicates of files whose types ought to be considered
-    residing with any depth under passed root directory by file name and
-    disk usage, and moves them on identification to trash for a possible
+    residing with any depth under passed root directories by file name and
+    disk usage, and moves them subsequently to trash for a possible
     manual duplicate status verification and consecutive irreversible removal
 
+    The root directories are walked through merely once, whilst building a shared in-memory
+    index of candidate groups, within which duplicates are subsequently resolved into
+    a removal plan. The scan itself doesn't alter the file system; planned duplicates
+    are moved to trash in batches afterwards, whereupon directories having become empty
+    are pruned in a single bottom-up pass
+
     Args:
-        --root: root directory path which shall be scoured for and stripped of file duplicates
+        --rootdir: root directory paths which shall be scoured for and stripped of file duplicates,
+            separated by os.pathsep; files residing under roots listed earlier are kept as reference
+            copies of the ones residing under roots listed later. Roots on distinct physical devices
+            are walked and hashed concurrently, the ones on the same spinning disk sequentially
         --fileextensions: extensions whose corresponding files ought to be searched for duplicates
-            on encounter, to be passed as comma-separated string """
+            on encounter, to be passed as comma-separated string
+        --verifycontent: identify duplicates by identical content regardless of their names
+            instead, by hashing files of identical size in stages
+        --audiopayload: identify duplicates by identical audio payload regardless of their names
+            and metadata, such as ID3 tags or RIFF chunks other than 'data', without decoding any audio
+        --workers: number of hashing threads per non-rotational device
+        --cachepath: path of the database caching content digests in between runs, defaults to
+            a file residing in the first root directory
+        --nocache: neither retrieve digests from nor store them in the cache
+        --rebuildcache: discard all cached digests prior to verification
+        --report: path of json or csv file the removal plan shall be written to
+        --dryrun: merely plan and report removals without moving anything to trash
+        --batchsize: number of files moved to trash at once
+        --stagelog: path of csv or jsonl file the wall time, cpu time, peak memory usage and
+            number of items of each stage, e.g. indexing or content verification, shall be
+            appended to """
 import os
-from pathlib import Path
-from typing import Iterator
-
-from send2trash import send2trash
-from tqdm import tqdm
-
-
-def get_reference_file(dir_path: str) -> Iterator[int]:
-    """ Walks through all file system objects residing in dir_path,
-        either triggers duplicates search and removal if encountering file which
-        ought to be considered, or recurses on encounter of non-empty directory
-        respectively
-
-        Args:
-            dir_path: directory path to be walked through and triggered duplicate search
-                from, := recursion parameter
-
-        Yields:
-            disk usage of removed duplicates in byte """
-
-    p_bar = tqdm(os.listdir(dir_path))
-    for file in p_bar:
-        file_path = os.path.join(dir_path, file)
-
-        # recurse if happening upon dir
-        if os.path.isdir(file_path):
-            if dir_path == ROOT_DIR_PATH:
-                p_bar.set_description(f'Walking through {file}...')
-            get_reference_file(file_path)
-
-        # search for duplicates and remove if existent
-        elif _consider_file(file_path):
-            yield from _remove_duplicates(file_path, dir_path=ROOT_DIR_PATH)
-
-
-def _consider_file(file_path: str) -> bool:
-    return _file_extension(file_path) in FILE_EXTENSIONS_2_CONSIDER
-
-
-def _file_extension(file_path: str) -> str:
-    """ Returns:
-            file extension without dot, e.g. 'mp3', 'wav' etc.
-
-        >>> _file_extension("C:\\Users\\User\\Music\\Flume\\B.I.G Flume (Album Mix) - YouTube.mp3")
-        'mp3' """
-
-    return os.path.splitext(file_path)[1][1:]
 
+from src.file_duplicate_remover import FileIndex, by_name_and_size, by_size, index_files, ungrouped
+from src.file_duplicate_remover._audio_payload import payload_index
+from src.file_duplicate_remover._content_verification import ContentVerifier
+from src.file_duplicate_remover._hash_cache import HashCache, default_cache_path
+from src.file_duplicate_remover._removal_plan import execute, prunable_directories, removal_plan, write_report
 
-def _remove_duplicates(reference_file_path: str, dir_path: str) -> Iterator[int]:
-    """ Walks through all file system objects residing in dir_path,
-        either checks whether duplicate of file residing under reference_file_path
-        and if so moves to trash if encountering file, or recurses on
-        encounter of non-empty directory respectively
 
-        Args:
-            reference_file_path: path of file whose duplicates shall be removed
-            dir_path: path under which to search for duplicate, := recursion
-                parameters
+def _report_bytes_read(verifier: ContentVerifier, candidate_index: FileIndex):
+    """ Displays the number of bytes read throughout each hashing stage alongside
+        the one a complete hashing of all candidates would've required """
 
-        Yields:
-            disk usage of removed duplicates in byte"""
+    candidate_size = sum(file.size for group in candidate_index.values() if len(group) > 1 for file in group)
 
-    for candidate in os.listdir(dir_path):
-        candidate_file_path = os.path.join(dir_path, candidate)
-
-        # recurse on encounter of non-empty directory
-        if os.path.isdir(candidate_file_path) and os.listdir(candidate_file_path):
-            yield from _remove_duplicates(reference_file_path, dir_path=candidate_file_path)
-
-        # move candidate to trash if containing_dir != containing_dir_reference_file,
-        # file worthy of being considered given its extension and contained file
-        # and reference file identical
-        elif dir_path != str(Path(reference_file_path).parent) and _consider_file(candidate_file_path) and _contain_identical_file(reference_file_path, candidate_file_path):
-            yield os.path.getsize(candidate_file_path)
-
-            send2trash(candidate_file_path)
-            print(f"Removed {_relative_path(reference_file_path)} duplicate residing at {dir_path}")
-
-            # move directory to trash if empty
-            if not os.listdir(dir_path):
-                send2trash(dir_path)
-
-
-def _contain_identical_file(*paths: str) -> bool:
-    """ Judges by whether or not files residing under paths possess
-        identical file name with extension and are of identical size """
-
-    return len(set(map(lambda path: (_file_name_with_extension(path), os.path.getsize(path)), paths))) == 1
-
-
-def _file_name_with_extension(file_path: str) -> str:
-    """
-    >>> _file_name_with_extension("C:\\Users\\User\\Music\\Flume\\B.I.G Flume (Album Mix) - YouTube.mp3")
-    'B.I.G Flume (Album Mix) - YouTube.mp3' """
-
-    return file_path.split(os.sep)[-1]
-
-
-def _relative_path(absolute_path: str) -> str:
-    """ Returns:
-            relative path with respect to ROOT_DIR_PATH """
-
-    return absolute_path[len(ROOT_DIR_PATH):]
+    for stage in verifier.STAGES:
+        print(f'Read {verifier.bytes_read[stage] / 1e6:.2f}MB throughout {stage} hashing stage, retrieved {verifier.cache_hits[stage]} digests from cache')
+    print(f'Complete hashing of all candidates would have required reading {candidate_size / 1e6:.2f}MB')
 
 
 if __name__ == '__main__':
-    from src.utils import parse_args
+    from src.utils import parse_args, stage
 
     # parse args
     args = parse_args(
-        ('-r', '--rootdir', str, 'root directory whose comprised file duplicates shall be removed', None),
-        ('-f', '--fileextensions', str, 'extentions of files who shall be considered', 'wma, MP3, mp3, m4a, wav')
+        ('-r', '--rootdir', str, f'root directories whose comprised file duplicates shall be removed, to be separated by "{os.pathsep}" and listed in descending reference copy priority', None),
+        ('-f', '--fileextensions', str, 'extentions of files who shall be considered', 'wma, MP3, mp3, m4a, wav'),
+        ('-c', '--verifycontent', bool, 'identify duplicates by content regardless of their file names', False),
+        ('-a', '--audiopayload', bool, 'identify duplicates by audio payload regardless of their file names and metadata', False),
+        ('-w', '--workers', int, 'number of hashing threads per non-rotational device, defaults to the ThreadPoolExecutor default', None),
+        ('-cp', '--cachepath', str, 'path of digest cache database, defaults to file within first root directory', None),
+        ('-nc', '--nocache', bool, 'ignore digest cache', False),
+        ('-rc', '--rebuildcache', bool, 'discard cached digests prior to verification', False),
+        ('-o', '--report', str, 'path of json or csv file the removal plan shall be written to', None),
+        ('-n', '--dryrun', bool, 'plan removals without moving anything to trash', False),
+        ('-b', '--batchsize', int, 'number of files moved to trash at once', 500)
     )
-    
-    ROOT_DIR_PATH = args.rootdir
+
+    ROOT_DIR_PATHS = list(map(os.path.abspath, args.rootdir.split(os.pathsep)))
     FILE_EXTENSIONS_2_CONSIDER = set(args.fileextensions.replace(' ', '').split(','))
+    AUDIO_PAYLOAD = args.audiopayload
+    VERIFY_CONTENT = args.verifycontent or AUDIO_PAYLOAD
+    N_WORKERS = args.workers
+    CACHE_PATH = None if args.nocache else args.cachepath or default_cache_path(ROOT_DIR_PATHS[0])
+    REBUILD_CACHE = args.rebuildcache
+    REPORT_PATH = args.report
+    DRY_RUN = args.dryrun
+    BATCH_SIZE = args.batchsize
+
+    # index files
+    with stage('indexing', message='Indexing files...') as record:
+        file_index = index_files(ROOT_DIR_PATHS, file_extensions=FILE_EXTENSIONS_2_CONSIDER, group_key=ungrouped if AUDIO_PAYLOAD else by_size if VERIFY_CONTENT else by_name_and_size)
+        record.n_items = sum(map(len, file_index.values()))
+
+    # split candidate groups by content if desired
+    if VERIFY_CONTENT:
+        cache = HashCache(CACHE_PATH, scheme='audiopayload' if AUDIO_PAYLOAD else 'content', rebuild=REBUILD_CACHE) if CACHE_PATH else None
+        if cache:
+            cache.evict_missing(ROOT_DIR_PATHS, present_file_paths=(file.path for group in file_index.values() for file in group))
+
+        content_ranges = None
+        if AUDIO_PAYLOAD:
+            with stage('payload_location', message='Locating audio payloads...', n_items=sum(map(len, file_index.values()))):
+                file_index, content_ranges = payload_index(file_index, n_workers=N_WORKERS, cache=cache)
+
+        with stage('content_verification', message='Verifying file contents...', n_items=sum(map(len, file_index.values()))):
+            content_verifier = ContentVerifier(n_workers=N_WORKERS, cache=cache, content_ranges=content_ranges)
+            candidate_index, file_index = file_index, content_verifier(file_index)
+        _report_bytes_read(content_verifier, candidate_index)
+
+        if cache:
+            cache.close()
+
+    # plan removals
+    with stage('planning') as record:
+        plan = removal_plan(file_index)
+        record.n_items = len(plan)
+    if REPORT_PATH:
+        write_report(plan, REPORT_PATH)
+        print(f'Wrote removal plan to {REPORT_PATH}')
+
+    # remove duplicates and prune directories having become empty
+    if not DRY_RUN:
+        with stage('removal', n_items=len(plan)):
+            execute(plan, batch_size=BATCH_SIZE)
+
+    with stage('pruning') as record:
+        empty_dir_paths = prunable_directories((planned_removal.duplicate for planned_removal in plan), root_dir_paths=ROOT_DIR_PATHS)
+
+        if not DRY_RUN and empty_dir_paths:
+            from send2trash import send2trash
+            send2trash(empty_dir_paths)
+        record.n_items = len(empty_dir_paths)
 
-    # remove duplicates
-    removed_file_sizes = list(get_reference_file(dir_path=ROOT_DIR_PATH))
-    
     # display number and total disk usage of removed duplicates
-    print(f'Removed {len(removed_file_sizes)} duplicates of a total of {sum(removed_file_sizes) / 1e6:.2f}MB')
+    print(f'{"Would have removed" if DRY_RUN else "Removed"} {len(plan)} duplicates of a total of {sum(planned_removal.size for planned_removal in plan) / 1e6:.2f}MB, as well as {len(empty_dir_paths)} directories')
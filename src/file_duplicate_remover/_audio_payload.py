@@ -0,0 +1,204 @@
+""" Locates the audio payload of common audio containers by means of merely reading
+    their headers, thus enabling the identification of recordings differing solely
+    in their metadata without decoding any audio """
+
+from typing import BinaryIO, Callable, Dict, Optional, Tuple
+from collections import defaultdict
+import os
+
+from src.file_duplicate_remover import ContentRange, FileIndex, IndexedFile
+from src.file_duplicate_remover._devices import DeviceExecutors
+from src.file_duplicate_remover._hash_cache import HashCache
+
+
+_PayloadLocator = Callable[[BinaryIO, int], ContentRange]
+
+
+def payload_index(index: FileIndex, n_workers: Optional[int] = None, cache: Optional[HashCache] = None) -> Tuple[FileIndex, Dict[str, ContentRange]]:
+    """ Regroups the files comprised by index by the length of their audio payload,
+        locating the latter concurrently across devices, unless being cached; files which
+        couldn't be read are discarded
+
+        Returns:
+            index mapping (payload length, ) onto files of corresponding payload length in
+                the order of index,
+            map of file paths onto (payload offset, payload length) """
+
+    files = [file for group in index.values() for file in group]
+    content_ranges = {file.path: cache.content_range(file) for file in files} if cache else {}
+
+    # locate payloads which haven't been cached
+    unlocated_files = [file for file in files if content_ranges.get(file.path) is None]
+    with DeviceExecutors(n_workers) as executor:
+        for file, content_range in zip(unlocated_files, executor.map(_payload_range, unlocated_files)):
+            content_ranges[file.path] = content_range
+
+            if cache and content_range is not None:
+                cache.store_content_range(file, content_range)
+
+    content_ranges = {path: content_range for path, content_range in content_ranges.items() if content_range is not None}
+
+    regrouped_index = defaultdict(list)
+    for file in files:
+        if file.path in content_ranges:
+            regrouped_index[(content_ranges[file.path][1], )].append(file)
+
+    return regrouped_index, content_ranges
+
+
+def _payload_range(file: IndexedFile) -> Optional[ContentRange]:
+    """ Returns:
+            (offset, length) of the audio payload if the file format being supported,
+            of the entire file otherwise, None if the file couldn't be read """
+
+    locate_payload = _PAYLOAD_LOCATORS.get(os.path.splitext(file.path)[1][1:].lower())
+    if locate_payload is None:
+        return 0, file.size
+
+    try:
+        with open(file.path, 'rb') as f:
+            offset, length = locate_payload(f, file.size)
+    except OSError:
+        return None
+    except ValueError:
+        return 0, file.size
+
+    return offset, max(min(length, file.size - offset), 0)
+
+
+def _read_at(f: BinaryIO, offset: int, n_bytes: int) -> bytes:
+    f.seek(offset)
+    return f.read(n_bytes)
+
+
+def _syncsafe_integer(data: bytes) -> int:
+    """ Decodes ID3v2 integer of 7 significant bits per byte
+
+        >>> _syncsafe_integer(bytes([0, 0, 2, 1]))
+        257
+        """
+
+    return sum((byte & 0x7f) << 7 * i for i, byte in enumerate(reversed(data)))
+
+
+def _mpeg_payload_range(f: BinaryIO, size: int) -> ContentRange:
+    """ Strips leading ID3v2 tags as well as trailing ID3v1(.1), extended ID3v1,
+        APEv2, Lyrics3v2 and appended ID3v2 tags, stacked in arbitrary order """
+
+    start, end = 0, size
+
+    # leading ID3v2 tags
+    while True:
+        header = _read_at(f, start, 10)
+        if len(header) < 10 or header[:3] != b'ID3':
+            break
+        start += 10 + _syncsafe_integer(header[6:10]) + (10 if header[5] & 0x10 else 0)
+
+    # trailing tags
+    while end > start:
+        if end - start >= 128 and _read_at(f, end - 128, 3) == b'TAG':
+            end -= 128
+            if end - start >= 227 and _read_at(f, end - 227, 4) == b'TAG+':
+                end -= 227
+        elif end - start >= 32 and _read_at(f, end - 32, 8) == b'APETAGEX':
+            footer = _read_at(f, end - 32, 32)
+            has_header = int.from_bytes(footer[20:24], 'little') & 0x80000000
+            # tag size includes the footer, but not the optional header
+            end -= max(int.from_bytes(footer[12:16], 'little'), 32) + (32 if has_header else 0)
+        elif end - start >= 15 and _read_at(f, end - 9, 9) == b'LYRICS200':
+            end -= 15 + int(_read_at(f, end - 15, 6))
+        elif end - start >= 10 and _read_at(f, end - 10, 3) == b'3DI':
+            end -= 20 + _syncsafe_integer(_read_at(f, end - 4, 4))
+        else:
+            break
+
+    return start, end - start
+
+
+def _riff_payload_range(f: BinaryIO, size: int) -> ContentRange:
+    """ Returns range of the 'data' chunk """
+
+    header = f.read(12)
+    if header[:4] not in (b'RIFF', b'RF64') or header[8:12] != b'WAVE':
+        return 0, size
+
+    offset = 12
+    while offset + 8 <= size:
+        chunk_header = _read_at(f, offset, 8)
+        chunk_size = int.from_bytes(chunk_header[4:8], 'little')
+
+        if chunk_header[:4] == b'data':
+            return offset + 8, chunk_size
+        offset += 8 + chunk_size + chunk_size % 2
+
+    return 0, size
+
+
+def _mp4_payload_range(f: BinaryIO, size: int) -> ContentRange:
+    """ Returns range of the top-level 'mdat' box """
+
+    offset = 0
+    while offset + 8 <= size:
+        header = _read_at(f, offset, 16)
+        box_size, box_type, header_size = int.from_bytes(header[:4], 'big'), header[4:8], 8
+
+        if box_size == 1:
+            box_size, header_size = int.from_bytes(header[8:16], 'big'), 16
+        elif box_size == 0:
+            box_size = size - offset
+
+        if box_size < header_size:
+            break
+        if box_type == b'mdat':
+            return offset + header_size, box_size - header_size
+        offset += box_size
+
+    return 0, size
+
+
+_ASF_DATA_OBJECT_GUID = bytes.fromhex('3626b2758e66cf11a6d900aa0062ce6c')
+_ASF_DATA_OBJECT_HEADER_SIZE = 50
+
+
+def _asf_payload_range(f: BinaryIO, size: int) -> ContentRange:
+    """ Returns range of the data packets comprised by the top-level data object """
+
+    offset = 0
+    while offset + 24 <= size:
+        header = _read_at(f, offset, 24)
+        object_size = int.from_bytes(header[16:24], 'little')
+
+        if header[:16] == _ASF_DATA_OBJECT_GUID:
+            return offset + _ASF_DATA_OBJECT_HEADER_SIZE, object_size - _ASF_DATA_OBJECT_HEADER_SIZE
+        if object_size < 24:
+            break
+        offset += object_size
+
+    return 0, size
+
+
+def _flac_payload_range(f: BinaryIO, size: int) -> ContentRange:
+    """ Returns range of the audio frames following the metadata blocks """
+
+    if f.read(4) != b'fLaC':
+        return 0, size
+
+    offset = 4
+    while offset + 4 <= size:
+        block_header = _read_at(f, offset, 4)
+        offset += 4 + int.from_bytes(block_header[1:4], 'big')
+
+        # last metadata block flag
+        if block_header[0] & 0x80:
+            return offset, size - offset
+
+    return 0, size
+
+
+_PAYLOAD_LOCATORS: Dict[str, _PayloadLocator] = {
+    **dict.fromkeys(('mp3', 'mp2', 'aac'), _mpeg_payload_range),
+    **dict.fromkeys(('wav', 'wave'), _riff_payload_range),
+    **dict.fromkeys(('m4a', 'mp4', 'm4b'), _mp4_payload_range),
+    **dict.fromkeys(('wma', 'asf'), _asf_payload_range),
+    'flac': _flac_payload_range
+}
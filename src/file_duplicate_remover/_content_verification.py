@@ -0,0 +1,156 @@
+from typing import Callable, Dict, Iterator, Optional, Tuple
+from collections import defaultdict
+import hashlib
+
+from src.file_duplicate_remover import ContentRange, FileIndex, IndexedFile
+from src.file_duplicate_remover._devices import DeviceExecutors
+from src.file_duplicate_remover._hash_cache import HashCache
+
+
+SAMPLE_SIZE = 64 * 1024
+CHUNK_SIZE = 4 * 1024 * 1024
+
+_Digest = Optional[bytes]
+_DigestFunction = Callable[[IndexedFile], Tuple[_Digest, int]]
+
+
+class ContentVerifier:
+    """ Splits the groups of an index into groups of files of identical content in stages,
+        each of which merely reads the files whose group members haven't been told apart yet:
+
+            1. groups of less than two members as well as empty files are discarded
+            2. head and tail samples of sample_size bytes are hashed
+            3. complete file contents are hashed by means of streamed chunks
+
+        Files are hashed concurrently on thread pools per physical device, hashlib as well as file
+        reads releasing the GIL, such that disk bandwidth rather than a single core becomes the
+        limiting factor, whilst files residing on spinning disks are read sequentially.
+        Files whose digests are present in the optionally passed cache aren't read at all """
+
+    STAGES = HashCache.STAGES
+
+    def __init__(self,
+                 n_workers: Optional[int] = None,
+                 sample_size=SAMPLE_SIZE,
+                 chunk_size=CHUNK_SIZE,
+                 cache: Optional[HashCache] = None,
+                 content_ranges: Optional[Dict[str, ContentRange]] = None):
+        """ Args:
+                n_workers: number of hashing threads per non-rotational device, defaults to the
+                    ThreadPoolExecutor default
+                sample_size: number of bytes hashed from both the head and the tail of each file
+                    throughout the sample stage
+                chunk_size: number of bytes read at once throughout the full stage
+                cache: cache digests are to be retrieved from and stored in
+                content_ranges: map of file paths onto (offset, length) of the content to
+                    be hashed, e.g. an audio payload, defaults to the entire file """
+
+        self._n_workers: Optional[int] = n_workers
+        self._sample_size: int = sample_size
+        self._chunk_size: int = chunk_size
+        self._cache: Optional[HashCache] = cache
+        self._content_ranges: Dict[str, ContentRange] = content_ranges or {}
+
+        self.bytes_read: Dict[str, int] = dict.fromkeys(self.STAGES, 0)
+        self.cache_hits: Dict[str, int] = dict.fromkeys(self.STAGES, 0)
+
+    def __call__(self, index: FileIndex) -> FileIndex:
+        """ Returns:
+                index mapping group keys extended by the content digests onto groups of
+                at least two files of identical content, group member order being preserved """
+
+        groups = {key: group for key, group in index.items() if len(group) > 1 and self._content_range(group[0])[1]}
+
+        with DeviceExecutors(self._n_workers) as executor:
+            groups = self._split(groups, executor, self._sample_digest, stage='sample')
+
+            # contents not exceeding two samples have already been hashed entirely
+            sampled_entirely = {key: group for key, group in groups.items() if self._content_range(group[0])[1] <= 2 * self._sample_size}
+            partially_sampled = {key: group for key, group in groups.items() if key not in sampled_entirely}
+
+            return {**sampled_entirely, **self._split(partially_sampled, executor, self._full_digest, stage='full')}
+
+    def _split(self, groups: FileIndex, executor: DeviceExecutors, digest_function: _DigestFunction, stage: str) -> FileIndex:
+        """ Hashes all files comprised by groups by means of digest_function, unless their digest
+            being cached, and splits the groups by the resulting digests, discarding files which
+            couldn't be read as well as groups of less than two members """
+
+        files = [(key, file) for key, group in groups.items() for file in group]
+        digests = {file.path: self._cache.digest(file, stage) for _, file in files} if self._cache else {}
+
+        # hash files whose digest hasn't been cached
+        uncached_files = [file for _, file in files if digests.get(file.path) is None]
+        self.cache_hits[stage] += len(files) - len(uncached_files)
+
+        for file, (digest, n_bytes_read) in zip(uncached_files, executor.map(digest_function, uncached_files)):
+            self.bytes_read[stage] += n_bytes_read
+            digests[file.path] = digest
+
+            if self._cache and digest is not None:
+                self._cache.store(file, stage, digest)
+
+        # split groups
+        split_groups = defaultdict(list)
+        for key, file in files:
+            if digests[file.path] is not None:
+                split_groups[key + (digests[file.path], )].append(file)
+
+        return {key: group for key, group in split_groups.items() if len(group) > 1}
+
+    def _content_range(self, file: IndexedFile) -> ContentRange:
+        return self._content_ranges.get(file.path, (0, file.size))
+
+    def _sample_digest(self, file: IndexedFile) -> Tuple[_Digest, int]:
+        hash_ = hashlib.blake2b()
+        n_bytes_read = 0
+        offset, length = self._content_range(file)
+
+        try:
+            with open(file.path, 'rb') as f:
+                f.seek(offset)
+                if length <= 2 * self._sample_size:
+                    samples = [f.read(length)]
+                else:
+                    samples = [f.read(self._sample_size)]
+                    f.seek(offset + length - self._sample_size)
+                    samples.append(f.read(self._sample_size))
+        except OSError:
+            return None, n_bytes_read
+
+        for sample in samples:
+            hash_.update(sample)
+            n_bytes_read += len(sample)
+
+        return hash_.digest(), n_bytes_read
+
+    def _full_digest(self, file: IndexedFile) -> Tuple[_Digest, int]:
+        hash_ = hashlib.blake2b()
+        n_bytes_read = 0
+
+        try:
+            for chunk in _chunks(file.path, self._chunk_size, *self._content_range(file)):
+                hash_.update(chunk)
+                n_bytes_read += len(chunk)
+        except OSError:
+            return None, n_bytes_read
+
+        return hash_.digest(), n_bytes_read
+
+
+def _chunks(file_path: str, chunk_size: int, offset: int, length: int) -> Iterator[memoryview]:
+    """ Yields:
+            views onto a single reused buffer, successively filled with the length bytes
+            of the file content starting at offset, thus not allocating a new bytes object
+            per chunk """
+
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+
+    with open(file_path, 'rb', buffering=0) as f:
+        f.seek(offset)
+        while length > 0:
+            n_bytes_read = f.readinto(view[:min(chunk_size, length)])
+            if not n_bytes_read:
+                break
+            length -= n_bytes_read
+            yield view[:n_bytes_read]
@@ -0,0 +1,75 @@
+from typing import Callable, Dict, Iterable, Iterator, NamedTuple, Optional, TypeVar
+from concurrent.futures import Future, ThreadPoolExecutor
+import functools
+import os
+
+
+_T = TypeVar('_T')
+_R = TypeVar('_R')
+
+
+class PhysicalDevice(NamedTuple):
+    identifier: str
+    rotational: bool
+
+
+@functools.lru_cache(maxsize=None)
+def physical_device(st_dev: int) -> PhysicalDevice:
+    """ Resolves the physical disk the file system of st_dev resides on by means of sysfs,
+        such that partitions of the same disk are being told to share the latter
+
+        Returns:
+            physical device, its identifier being the sysfs disk path if resolvable, st_dev
+            otherwise; devices whose rotational status can't be determined, e.g. network shares
+            or file systems on non-Linux platforms, are deemed non-rotational """
+
+    try:
+        device_path = os.path.realpath(f'/sys/dev/block/{os.major(st_dev)}:{os.minor(st_dev)}')
+    except AttributeError:
+        return PhysicalDevice(str(st_dev), rotational=False)
+
+    if os.path.exists(os.path.join(device_path, 'partition')):
+        device_path = os.path.dirname(device_path)
+
+    try:
+        with open(os.path.join(device_path, 'queue', 'rotational')) as f:
+            return PhysicalDevice(device_path, rotational=f.read().strip() == '1')
+    except OSError:
+        return PhysicalDevice(str(st_dev), rotational=False)
+
+
+class DeviceExecutors:
+    """ Thread pools per physical device, each of which running tasks concerning
+        a spinning disk sequentially in order to avoid seek thrashing, whilst
+        running the ones concerning other devices on n_workers threads """
+
+    def __init__(self, n_workers: Optional[int] = None):
+        self._n_workers: Optional[int] = n_workers
+        self._executors: Dict[PhysicalDevice, ThreadPoolExecutor] = {}
+
+    def submit(self, st_dev: int, fn: Callable[..., _R], *args) -> 'Future[_R]':
+        device = physical_device(st_dev)
+
+        if device not in self._executors:
+            self._executors[device] = ThreadPoolExecutor(1 if device.rotational else self._n_workers)
+        return self._executors[device].submit(fn, *args)
+
+    def map(self, fn: Callable[[_T], _R], items: Iterable[_T], st_dev: Callable[[_T], int] = lambda file: file.device) -> Iterator[_R]:
+        """ Runs fn on all items concurrently across devices
+
+            Yields:
+                results in order of items """
+
+        futures = [self.submit(st_dev(item), fn, item) for item in items]
+        for future in futures:
+            yield future.result()
+
+    def shutdown(self):
+        for executor in self._executors.values():
+            executor.shutdown()
+
+    def __enter__(self) -> 'DeviceExecutors':
+        return self
+
+    def __exit__(self, *_):
+        self.shutdown()
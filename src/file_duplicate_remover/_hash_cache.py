@@ -0,0 +1,133 @@
+from typing import Any, Dict, Iterable, Optional, Set, Tuple
+import os
+import sqlite3
+
+from src.file_duplicate_remover import ContentRange, IndexedFile
+
+
+_StatKey = Tuple[int, int, int]
+
+
+class HashCache:
+    """ SQLite backed on-disk cache of the partial and full content digests computed
+        throughout the content verification, as well as of the located content ranges,
+        keyed by file path and hashing scheme and invalidated on any change of the
+        corresponding inode, size or modification time
+
+        The entire cache is loaded into memory at opening and written back in a single
+        transaction at closing, such that lookups don't entail any database round trip """
+
+    FILE_NAME = '.file_duplicate_remover_cache.sqlite'
+    STAGES = ('sample', 'full')
+
+    _SCHEMA_VERSION = 2
+
+    def __init__(self, path: str, scheme='content', rebuild=False):
+        """ Args:
+                path: cache database file path, created if not existent
+                scheme: identifier of what's being hashed, e.g. the entire file content or
+                    merely its audio payload, entries of other schemes being left untouched
+                rebuild: discard all entries of possibly existing cache """
+
+        self._connection = sqlite3.connect(path)
+        self._scheme: str = scheme
+
+        if rebuild or self._connection.execute('PRAGMA user_version').fetchone()[0] != self._SCHEMA_VERSION:
+            self._create_schema()
+
+        self._entries: Dict[str, Tuple[_StatKey, Dict[str, Any]]] = {}
+        for path, inode, size, mtime_ns, offset, length, *digests in self._connection.execute(f'SELECT path, inode, size, mtime_ns, range_offset, range_length, {", ".join(self.STAGES)} FROM digests WHERE scheme = ?', (scheme, )):
+            values = {stage: digest for stage, digest in zip(self.STAGES, digests) if digest is not None}
+            if offset is not None:
+                values['range'] = (offset, length)
+            self._entries[path] = ((inode, size, mtime_ns), values)
+
+        self._modified_paths: Set[str] = set()
+        self._evicted_paths: Set[str] = set()
+
+    def _create_schema(self):
+        with self._connection:
+            self._connection.execute('DROP TABLE IF EXISTS digests')
+            self._connection.execute(f'CREATE TABLE digests (path TEXT, scheme TEXT, inode INTEGER, size INTEGER, mtime_ns INTEGER, range_offset INTEGER, range_length INTEGER, {", ".join(f"{stage} BLOB" for stage in self.STAGES)}, PRIMARY KEY (path, scheme))')
+            self._connection.execute(f'PRAGMA user_version = {self._SCHEMA_VERSION}')
+
+    @staticmethod
+    def _stat_key(file: IndexedFile) -> _StatKey:
+        return file.inode, file.size, file.mtime_ns
+
+    def _value(self, file: IndexedFile, key: str) -> Optional[Any]:
+        stat_key, values = self._entries.get(file.path, (None, {}))
+        if stat_key != self._stat_key(file):
+            return None
+        return values.get(key)
+
+    def _store(self, file: IndexedFile, key: str, value: Any):
+        """ Stores value, discarding all others if file has changed since their computation """
+
+        stat_key = self._stat_key(file)
+        cached_stat_key, values = self._entries.get(file.path, (None, {}))
+
+        if cached_stat_key != stat_key:
+            values = {}
+            self._entries[file.path] = (stat_key, values)
+
+        values[key] = value
+        self._modified_paths.add(file.path)
+
+    def digest(self, file: IndexedFile, stage: str) -> Optional[bytes]:
+        """ Returns:
+                cached digest of stage if file hasn't changed since its computation, None otherwise """
+
+        return self._value(file, stage)
+
+    def store(self, file: IndexedFile, stage: str, digest: bytes):
+        self._store(file, stage, digest)
+
+    def content_range(self, file: IndexedFile) -> Optional[ContentRange]:
+        """ Returns:
+                cached (offset, length) of the hashed content if file hasn't changed since
+                its location, None otherwise """
+
+        return self._value(file, 'range')
+
+    def store_content_range(self, file: IndexedFile, content_range: ContentRange):
+        self._store(file, 'range', content_range)
+
+    def evict_missing(self, root_dir_paths: Iterable[str], present_file_paths: Iterable[str]):
+        """ Evicts the entries of files residing within any of root_dir_paths which aren't
+            comprised by present_file_paths, being the ones indexed by the current walk, such
+            that no file system access is required beyond it, whereas entries outside of the
+            roots, possibly originating from runs over other root directories sharing the
+            cache, are being left untouched """
+
+        root_dir_paths = tuple(os.path.join(os.path.abspath(root_dir_path), '') for root_dir_path in root_dir_paths)
+        present_file_paths = set(present_file_paths)
+
+        self._evicted_paths = {path for path in self._entries if path not in present_file_paths and os.path.abspath(path).startswith(root_dir_paths)}
+        for path in self._evicted_paths:
+            del self._entries[path]
+
+    def close(self):
+        """ Writes back modified entries, deletes evicted ones and closes the database connection """
+
+        def row(path: str) -> tuple:
+            stat_key, values = self._entries[path]
+            return (path, self._scheme, *stat_key, *values.get('range', (None, None)), *map(values.get, self.STAGES))
+
+        with self._connection:
+            self._connection.executemany('DELETE FROM digests WHERE path = ?', ((path, ) for path in self._evicted_paths))
+            self._connection.executemany(
+                f'INSERT OR REPLACE INTO digests VALUES (?, ?, ?, ?, ?, ?, ?, {", ".join("?" * len(self.STAGES))})',
+                map(row, self._modified_paths)
+            )
+        self._connection.close()
+
+    def __enter__(self) -> 'HashCache':
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+
+def default_cache_path(root_dir_path: str) -> str:
+    return os.path.join(root_dir_path, HashCache.FILE_NAME)
@@ -0,0 +1,87 @@
+from typing import Iterable, List, NamedTuple, Sequence, Set
+import csv
+import json
+import os
+
+
+from src.file_duplicate_remover import FileIndex, duplicates
+
+
+class PlannedRemoval(NamedTuple):
+    reference: str
+    duplicate: str
+    size: int
+
+
+def removal_plan(index: FileIndex) -> List[PlannedRemoval]:
+    """ Resolves the duplicates within index without touching the file system """
+
+    return [PlannedRemoval(reference_file.path, duplicate.path, duplicate.size) for reference_file, duplicate in duplicates(index)]
+
+
+def write_report(plan: List[PlannedRemoval], report_path: str):
+    """ Writes plan as csv if report_path ending on '.csv', as json otherwise """
+
+    with open(report_path, 'w', newline='', encoding='utf-8') as f:
+        if report_path.lower().endswith('.csv'):
+            writer = csv.writer(f)
+            writer.writerow(PlannedRemoval._fields)
+            writer.writerows(plan)
+        else:
+            json.dump([planned_removal._asdict() for planned_removal in plan], f, indent=2)
+
+
+def execute(plan: List[PlannedRemoval], batch_size: int):
+    """ Moves the planned duplicates to trash in batches of batch_size files """
+
+    from send2trash import send2trash
+    from tqdm import tqdm
+
+    duplicate_paths = [planned_removal.duplicate for planned_removal in plan]
+
+    for i in tqdm(range(0, len(duplicate_paths), batch_size), desc='Moving duplicates to trash'):
+        send2trash(duplicate_paths[i:i + batch_size])
+
+
+def prunable_directories(removed_file_paths: Iterable[str], root_dir_paths: Sequence[str]) -> List[str]:
+    """ Determines the directories residing under root_dir_paths which are empty, or
+        respectively will be so after the removal of removed_file_paths, by means of a
+        single bottom-up pass over the directories having comprised removed files, as
+        well as their ancestors below the respective root
+
+        Returns:
+            topmost empty directories, the trashing of which entails the one of all empty
+            directories below them """
+
+    root_dir_paths = list(map(os.path.abspath, root_dir_paths))
+    removed_file_paths = set(map(os.path.abspath, removed_file_paths))
+
+    # gather directories having comprised removed files as well as their ancestors below root
+    candidates: Set[str] = set()
+    for file_path in removed_file_paths:
+        root_dir_path = _containing_root(file_path, root_dir_paths)
+        dir_path = os.path.dirname(file_path)
+
+        while dir_path not in candidates and dir_path != root_dir_path and _is_ancestor(root_dir_path, dir_path):
+            candidates.add(dir_path)
+            dir_path = os.path.dirname(dir_path)
+
+    # determine empty directories, children being assessed before their parents
+    empty_dir_paths: Set[str] = set()
+    for dir_path in sorted(candidates, key=lambda path: path.count(os.sep), reverse=True):
+        remaining_paths = {os.path.join(dir_path, name) for name in os.listdir(dir_path)} - removed_file_paths - empty_dir_paths
+        if not remaining_paths:
+            empty_dir_paths.add(dir_path)
+
+    return sorted(dir_path for dir_path in empty_dir_paths if os.path.dirname(dir_path) not in empty_dir_paths)
+
+
+def _containing_root(file_path: str, root_dir_paths: Sequence[str]) -> str:
+    """ Returns:
+            innermost root file_path resides under """
+
+    return max((root_dir_path for root_dir_path in root_dir_paths if _is_ancestor(root_dir_path, file_path)), key=len)
+
+
+def _is_ancestor(ancestor_path: str, path: str) -> bool:
+    return os.path.commonpath([ancestor_path, path]) == ancestor_path
@@ -1,56 +1,121 @@
+from __future__ import annotations
+
 import os
-from typing import Tuple, List, Optional
+import tempfile
+from typing import Callable, Tuple, Optional, Sequence
+
+from src.utils import kick_off_message_displayer, lazy_import
+
+cv2 = lazy_import('cv2')
+np = lazy_import('numpy')
+
+
+@kick_off_message_displayer('Sequentializing pixels...', count=len)
+def get_pixels(image: np.ndarray) -> np.ndarray:
+    """ Returns:
+            view of shape (n_pixels, n_channels) onto image """
+
+    return image.reshape(-1, image.shape[-1])
+
+
+@kick_off_message_displayer('Determining unique colors...', count=lambda result: len(result[0]))
+def get_unique_colors(pixels: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """ Packs the channel values of each pixel into a single integer key, e.g. a 24-bit
+        one for 8-bit BGR pixels, thus enabling a one-dimensional np.unique
+
+        Args:
+            pixels: integer array of shape (n_pixels, n_channels)
 
-import numpy as np
-from tqdm import tqdm
+        Returns:
+            unique colors of shape (n_unique_colors, n_channels),
+            their pixel counts of shape (n_unique_colors, ),
+            indices of shape (n_pixels, ) mapping each pixel onto its unique color """
 
-from src.utils import kick_off_message_displayer
+    n_bits = np.iinfo(pixels.dtype).bits
+    shifts = np.arange(pixels.shape[1])[::-1].astype(np.uint64) * np.uint64(n_bits)
 
+    keys = np.zeros(len(pixels), dtype=np.uint64)
+    for channel, shift in enumerate(shifts):
+        keys |= pixels[:, channel].astype(np.uint64) << shift
 
-class IndexedPixel(np.ndarray):
-    """ Serving the convenient storage of the pixel location indices """
+    unique_keys, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+    del keys
 
-    def __new__(cls, rgb_values: np.ndarray, indices: Tuple[int, int]):
-        """ Args:
-        rgb_values: ndarray of shape (3, )
-        indices: Tuple[row, column] """
+    unique_colors = ((unique_keys[:, np.newaxis] >> shifts) & np.uint64(2 ** n_bits - 1)).astype(pixels.dtype)
+    return unique_colors, counts, inverse.reshape(-1).astype(np.min_scalar_type(len(unique_keys) - 1))
 
-        obj = rgb_values.view(cls)
-        obj.indices = indices
-        return obj
 
-    def __array_finalize__(self, obj):
-        if obj is None:
-            return
+@kick_off_message_displayer('Sampling pixels...', count=len)
+def sample_pixels(image_file_paths: Sequence[str], n_samples: int, seed: Optional[int] = None) -> np.ndarray:
+    """ Draws an equal number of pixels from each image, decoded at half resolution in order
+        to speed up decoding, files which can't be decoded as image being skipped
+
+        Returns:
+            pixel samples of shape (<= n_samples, n_channels) """
+
+    rng = np.random.RandomState(seed)
+    n_samples_per_image = -(-n_samples // max(len(image_file_paths), 1))
+    samples = []
+
+    from tqdm import tqdm
+    for image_file_path in tqdm(image_file_paths):
+        image = cv2.imread(image_file_path, cv2.IMREAD_REDUCED_COLOR_2)
+        if image is None:
+            continue
+
+        pixels = image.reshape(-1, image.shape[-1])
+        samples.append(pixels[rng.randint(0, len(pixels), size=min(n_samples_per_image, len(pixels)))])
+
+    return np.concatenate(samples)
+
+
+def get_palette(centroids: np.ndarray, dtype: np.dtype) -> np.ndarray:
+    """ Returns:
+            centroids rounded to and clipped by the value range of dtype """
+
+    if np.issubdtype(dtype, np.integer):
+        centroids = np.clip(np.rint(centroids), np.iinfo(dtype).min, np.iinfo(dtype).max)
+    return centroids.astype(dtype)
 
-        self.indices = getattr(obj, 'indices', None)
 
+@kick_off_message_displayer('Restoring image...', count=lambda image: image.shape[0] * image.shape[1])
+def restore_image(labels: np.ndarray, palette: np.ndarray, image_shape: Tuple[int, ...]) -> np.ndarray:
+    """ Assign image of equal shape as the original one with the palette colors
+        corresponding to the clusters the respective pixels ended up in
 
-@kick_off_message_displayer('Sequentializing pixels...')
-def get_indexed_pixels(image: np.ndarray) -> List[IndexedPixel]:
-    indexed_pixels = []
+        Args:
+            labels: cluster indices of shape (n_pixels, )
+            palette: cluster colors of shape (n_clusters, n_channels) """
 
-    for i, row in enumerate(image):
-        for j, pixel in enumerate(row):
-            indexed_pixels.append(IndexedPixel(pixel, indices=(i, j)))
+    return palette[labels].reshape(image_shape)
 
-    return indexed_pixels
 
+@kick_off_message_displayer('Restoring image tile-wise...', count=lambda image: image.shape[0] * image.shape[1])
+def restore_image_tiled(image: np.ndarray, palette: np.ndarray, assign: Callable[[np.ndarray], np.ndarray], tile_height: int, buffer_dir_path: Optional[str] = None) -> np.memmap:
+    """ Assigns the pixels of horizontal image tiles to the palette one tile at a time and
+        writes the restored tiles to a memory-mapped buffer backed by an anonymous temporary
+        file, such that merely a single tile is being held in memory besides the image itself
 
-@kick_off_message_displayer('Restoring image...')
-def restore_image(pixel_clusters: List[IndexedPixel], image_shape: Tuple[int]) -> np.ndarray:
-    """ Assign image of equal shape as the original one with the means of
-        the rgb value clusters the respective pixels ended up in """
+        Args:
+            image: array of shape (height, width, n_channels)
+            palette: cluster colors of shape (n_clusters, n_channels)
+            assign: function mapping pixels of shape (n_pixels, n_channels) onto their palette indices
+            tile_height: number of image rows per tile
+            buffer_dir_path: directory the buffer file is being created in, defaults to the
+                platform's temporary directory
 
-    image = np.zeros(shape=image_shape)
+        Returns:
+            restored image of equal shape as the original one """
 
-    for pixel_cluster in tqdm(pixel_clusters):
-        cluster_mean = np.mean(pixel_cluster, axis=0)
+    restored_image = np.memmap(tempfile.TemporaryFile(dir=buffer_dir_path), dtype=palette.dtype, mode='w+', shape=image.shape)
 
-        for pixel in pixel_cluster:
-            image[pixel.indices] = cluster_mean
+    from tqdm import tqdm
+    for start in tqdm(range(0, image.shape[0], tile_height)):
+        tile = image[start:start + tile_height]
+        restored_image[start:start + tile_height] = palette[assign(tile.reshape(-1, tile.shape[-1]))].reshape(tile.shape)
 
-    return image
+    restored_image.flush()
+    return restored_image
 
 
 def get_write_path(original_path: str, write_dir_path: Optional[str], n_clusters: int, conducted_iterations: int) -> str:
@@ -4,31 +4,120 @@
 	Original file will be left untouched while the thus created image will be written to
 	the directory, the former is residing in.
 
+	Alternatively, a fixed palette may be passed, which the image pixels will be assigned
+	to without any clustering. Pixels may be assigned to the final palette by means of a
+	quantized color space lookup table, being cached for recurring palettes.
+
+	In directory mode, a palette shared by all images may be fitted on a pixel sample drawn
+	from the entire directory, or alternatively each image's clustering may be started from
+	the centroids the preceding image's one ended up with, both of which reduce the total
+	number of iterations and result in consistent colors throughout sequences of similar images.
+
+	For images too large to be clustered entirely, e.g. gigapixel mosaics, a tiled mode fits
+	the palette on a pixel sample and subsequently assigns the image tile by tile to it,
+	buffering the resulting image in a memory-mapped file prior to its encoding.
+
 	Refer to the bottom of this file in order to read up on the passable cli options. """
 
-import cv2
+from __future__ import annotations
+
+import os
+from typing import Optional
+
+from src.image_color_reduction import get_palette, get_pixels, get_unique_colors, get_write_path, restore_image, restore_image_tiled, sample_pixels
+from src.image_color_reduction._k_means_clustering import BATCH_SIZE, KMeansClusterer, MiniBatchKMeansClusterer, nearest_centroids
+from src.image_color_reduction._palette_lookup_table import palette_lookup_table
+from src.utils import lazy_import, stage
+
+cv2 = lazy_import('cv2')
+np = lazy_import('numpy')
 
-from src.image_color_reduction import get_indexed_pixels, get_write_path, restore_image
-from src.image_color_reduction._k_means_clustering import KMeansClusterer
+
+CLUSTERERS = {'full': KMeansClusterer, 'minibatch': MiniBatchKMeansClusterer}
+
+# centroids of the preceding clustering, serving as initial ones of the next one if warm starting
+_previous_centroids: Optional[np.ndarray] = None
 
 
 def main(image_file_path: str):
-	# open image and get indexed, sequentialized pixels
-	original_image = cv2.imread(image_file_path)
-	indexed_pixels = get_indexed_pixels(original_image)
+	if TILE_HEIGHT:
+		return _main_tiled(image_file_path)
+
+	# open image and get sequentialized pixel view
+	with stage('decoding'):
+		original_image = cv2.imread(image_file_path)
+	pixels = get_pixels(original_image)
 
-	# cluster rgb values being present in image
-	clusterer = KMeansClusterer(indexed_pixels, N_CLUSTERS, max_iterations=MAX_ITERATIONS, seed=SEED)
-	clusters = clusterer()
+	# assign pixels to fixed palette if passed
+	if FIXED_PALETTE is not None:
+		with stage('assignment', n_items=len(pixels)):
+			labels, centroids, n_conducted_iterations = _assign(pixels, FIXED_PALETTE), FIXED_PALETTE, 0
+
+	# otherwise cluster rgb values being present in image, either all of them or merely
+	# the unique ones weighted by their pixel counts
+	elif UNIQUE_COLORS:
+		unique_colors, counts, inverse = get_unique_colors(pixels)
+		clusterer = _clusterer(unique_colors, weights=counts)
+		labels, centroids, n_conducted_iterations = clusterer()[inverse], clusterer.centroids, clusterer.n_conducted_iterations
+	else:
+		clusterer = _clusterer(pixels)
+		labels, centroids, n_conducted_iterations = clusterer(), clusterer.centroids, clusterer.n_conducted_iterations
+
+	global _previous_centroids
+	_previous_centroids = centroids
+	palette = get_palette(centroids, dtype=original_image.dtype)
 
 	# write color reduced image
-	write_path = get_write_path(image_file_path, WRITE_DIR_PATH, n_clusters=N_CLUSTERS, conducted_iterations=clusterer.n_conducted_iterations)
-	cv2.imwrite(write_path, restore_image(clusters, image_shape=original_image.shape))
+	write_path = get_write_path(image_file_path, WRITE_DIR_PATH, n_clusters=len(palette), conducted_iterations=n_conducted_iterations)
+	restored_image = restore_image(labels, palette, image_shape=original_image.shape)
+	with stage('encoding'):
+		cv2.imwrite(write_path, restored_image)
 	print(f'Saved color reduced image to {write_path}')
 
 
+def _main_tiled(image_file_path: str):
+	# fit palette on pixel sample of image, unless fixed one passed
+	if FIXED_PALETTE is not None:
+		centroids, n_conducted_iterations = FIXED_PALETTE, 0
+	else:
+		clusterer = _clusterer(sample_pixels([image_file_path], n_samples=SAMPLE_SIZE, seed=SEED))
+		clusterer()
+		centroids, n_conducted_iterations = clusterer.centroids, clusterer.n_conducted_iterations
+
+	global _previous_centroids
+	_previous_centroids = centroids
+
+	# assign image tile-wise to palette
+	with stage('decoding'):
+		original_image = cv2.imread(image_file_path)
+	palette = get_palette(centroids, dtype=original_image.dtype)
+	write_path = get_write_path(image_file_path, WRITE_DIR_PATH, n_clusters=len(palette), conducted_iterations=n_conducted_iterations)
+	restored_image = restore_image_tiled(original_image, palette, assign=lambda pixels: _assign(pixels, centroids), tile_height=TILE_HEIGHT, buffer_dir_path=os.path.dirname(os.path.abspath(write_path)))
+	del original_image
+
+	with stage('encoding'):
+		cv2.imwrite(write_path, restored_image)
+	print(f'Saved color reduced image to {write_path}')
+
+
+def _assign(pixels: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+	""" Assigns pixels to their nearest centroid, by means of a lookup table if desired """
+
+	if LOOKUP_TABLE_BITS:
+		return palette_lookup_table(centroids, n_bits=LOOKUP_TABLE_BITS)(pixels)
+	return nearest_centroids(pixels, centroids)
+
+
+def _clusterer(data: np.ndarray, **kwargs) -> KMeansClusterer:
+	if MODE == 'minibatch':
+		kwargs.update(batch_size=BATCH_SIZE, assignment=_assign)
+	if WARM_START:
+		kwargs.update(initial_centroids=_previous_centroids)
+	return CLUSTERERS[MODE](data, N_CLUSTERS, max_iterations=MAX_ITERATIONS, seed=SEED, initialization=INITIALIZATION, **kwargs)
+
+
 if __name__ == '__main__':
-	from src.utils import parse_args, run
+	from src.utils import directory_file_paths, parse_args, run
 
 	args = parse_args(
 		('-p', '--path', str, 'image path', None),
@@ -36,6 +125,16 @@ if __name__ == '__main__':
 		('-m', '--maxiterations', int, 'maximal amount of conducted kMeans clustering iterations', 5),
 		('-s', '--seed', int, 'rng seed, affects centroid initialization', None),
 		('-w', '--writedirpath', str, 'directory path resulting image shall be written to, defaults to dir original image residing at', None),
+		('-u', '--uniquecolors', bool, 'cluster merely the unique colors weighted by their pixel counts instead of all pixels', False),
+		('-i', '--initialization', str, f'centroid initialization, one of {KMeansClusterer.INITIALIZATIONS}', 'random'),
+		('-md', '--mode', str, f'clustering mode, one of {tuple(CLUSTERERS)}; minibatch fits the centroids on random batches and is thus suited for very large images', 'full'),
+		('-b', '--batchsize', int, 'number of data points per mini-batch', BATCH_SIZE),
+		('-pl', '--palette', str, 'path of .npy file comprising fixed palette of shape (n_colors, 3) in BGR order pixels shall be assigned to instead of clustering', None),
+		('-l', '--lookuptablebits', int, 'bits per channel of the lookup table pixels are assigned to the final palette by, e.g. 5 or 6; exact assignment if not passed', None),
+		('-sp', '--sharedpalette', bool, 'directory mode: fit a single palette on a pixel sample drawn from all images and apply it to each of them', False),
+		('-ss', '--samplesize', int, 'number of pixels the shared or tiled mode palette is fitted on', 2 ** 20),
+		('-ws', '--warmstart', bool, "directory mode: start each image's clustering from the preceding image's centroids", False),
+		('-t', '--tileheight', int, 'tiled mode: number of image rows being assigned to the palette at once, e.g. 256; image is processed entirely if not passed', None),
 		include_dir_argument=True
 	)
 
@@ -46,5 +145,20 @@ if __name__ == '__main__':
 	MAX_ITERATIONS = args.maxiterations
 	SEED = args.seed
 	WRITE_DIR_PATH = args.writedirpath
+	UNIQUE_COLORS = args.uniquecolors
+	INITIALIZATION = args.initialization
+	MODE = args.mode
+	BATCH_SIZE = args.batchsize
+	FIXED_PALETTE = None if args.palette is None else np.load(args.palette).astype(np.float64)
+	LOOKUP_TABLE_BITS = args.lookuptablebits
+	WARM_START = args.warmstart
+	SAMPLE_SIZE = args.samplesize
+	TILE_HEIGHT = args.tileheight
+
+	# fit shared palette on pixels sampled from all images residing in directory
+	if args.sharedpalette and DIRECTORY_PATH:
+		shared_palette_clusterer = _clusterer(sample_pixels(directory_file_paths(DIRECTORY_PATH), n_samples=args.samplesize, seed=SEED))
+		shared_palette_clusterer()
+		FIXED_PALETTE = shared_palette_clusterer.centroids
 
 	run(main, file_path=FILE_PATH, directory_path=DIRECTORY_PATH)
@@ -1,12 +1,17 @@
-from typing import Sequence, List, Optional
-import itertools
+from __future__ import annotations
 
-from tqdm import tqdm
-import numpy as np
+from typing import Callable, Optional
 
+from src.utils import kick_off_message_displayer, lazy_import
 
-def euclidean_distance(a: np.ndarray, b: np.ndarray) -> float:
-    return np.linalg.norm(a - b)
+np = lazy_import('numpy')
+
+
+# number of data points whose centroid distances are computed at once
+CHUNK_SIZE = 2 ** 16
+
+BATCH_SIZE = 2 ** 12
+INERTIA_SAMPLE_SIZE = 2 ** 16
 
 
 def ordinal_number(number: int) -> str:
@@ -22,83 +27,267 @@ def ordinal_number(number: int) -> str:
     return "%d%s" % (number, "tsnrhtdd"[(number // 10 % 10 != 1) * (number % 10 < 4) * number % 10::4])
 
 
+def nearest_centroids(data: np.ndarray, centroids: np.ndarray, chunk_size=CHUNK_SIZE) -> np.ndarray:
+    """ Computes squared euclidean distances by means of the expansion ‖x‖² - 2x·c + ‖c‖²
+        in chunks of chunk_size data points, thus bounding the memory footprint to
+        chunk_size * (n_dimensions + n_centroids) floats
+
+        Args:
+            data: array of shape (n_data_points, n_dimensions)
+            centroids: array of shape (n_centroids, n_dimensions)
+
+        Returns:
+            array of shape (n_data_points, ) of the smallest unsigned int dtype capable of
+            holding the centroid indices, comprising the indices of the respectively
+            nearest centroid """
+
+    centroids = centroids.astype(np.float64)
+    centroid_norms = np.einsum('ij,ij->i', centroids, centroids)
+    labels = np.empty(len(data), dtype=np.min_scalar_type(len(centroids) - 1))
+
+    for start in range(0, len(data), chunk_size):
+        chunk = data[start:start + chunk_size].astype(np.float64)
+
+        # ‖x‖² being constant throughout a row, it doesn't affect the nearest centroid
+        distances = centroid_norms - 2 * chunk @ centroids.T
+        labels[start:start + chunk_size] = distances.argmin(axis=1)
+
+    return labels
+
+
 class KMeansClusterer:
-    _Cluster = List[np.ndarray]
-    _ClusterComposition = List[_Cluster]
+    INITIALIZATIONS = ('random', 'kmeans++')
 
     def __init__(self,
-                 data: Sequence[np.ndarray],
+                 data: np.ndarray,
                  n_clusters: int,
                  max_iterations=20,
-                 seed: Optional[int] = None):
+                 seed: Optional[int] = None,
+                 chunk_size=CHUNK_SIZE,
+                 weights: Optional[np.ndarray] = None,
+                 initialization='random',
+                 initial_centroids: Optional[np.ndarray] = None):
+        """ Args:
+                data: array of shape (n_data_points, n_dimensions)
+                weights: data point weights of shape (n_data_points, ), e.g. the pixel counts of
+                    unique colors, all data points being weighted equally if not passed
+                initialization: centroid initialization method, one of INITIALIZATIONS
+                initial_centroids: centroids of shape (n_clusters, n_dimensions) to start from,
+                    e.g. the ones of a preceding clustering of similar data, overriding
+                    initialization if passed """
 
         # set seed if passed
         if seed:
             np.random.seed(seed)
 
-        self._data: Sequence[np.ndarray] = data
-        self._n_clusters: int = n_clusters
+        self._data: np.ndarray = data
+        self._weights: Optional[np.ndarray] = weights
+        self._n_clusters: int = min(n_clusters, len(data))
         self._max_iterations: int = max_iterations
-
-        # initialize centroids randomistically
-        self._centroids: List[np.ndarray] = self._unique_random_samples(data, n=n_clusters)
-
+        self._chunk_size: int = chunk_size
+
+        # initialize centroids
+        if initialization not in self.INITIALIZATIONS:
+            raise ValueError(f'Unknown initialization {initialization}, choose one of {self.INITIALIZATIONS}')
+
+        if initial_centroids is not None:
+            self.centroids: np.ndarray = initial_centroids.astype(np.float64)
+            self._n_clusters = len(initial_centroids)
+        elif initialization == 'kmeans++':
+            self.centroids = self._k_means_plus_plus_samples(self._data, n=self._n_clusters)
+        else:
+            self.centroids = self._unique_random_samples(self._data, n=self._n_clusters).astype(np.float64)
+        self.labels: Optional[np.ndarray] = None
+
+        from tqdm import tqdm
         self._progress_bar = tqdm(total=self._max_iterations)
         self.n_conducted_iterations: int = 0
+        self.inertia: Optional[float] = None
 
     @staticmethod
-    def _unique_random_samples(data: Sequence[np.ndarray], n: int) -> List[np.ndarray]:
+    def _unique_random_samples(data: np.ndarray, n: int) -> np.ndarray:
         indices = np.arange(len(data))
         np.random.shuffle(indices)
-        return np.array_split(np.array(data)[indices[:n]], n, axis=0)
+        return data[indices[:n]]
+
+    def _k_means_plus_plus_samples(self, data: np.ndarray, n: int) -> np.ndarray:
+        """ Samples the first centroid proportionally to the data point weights and each
+            subsequent one proportionally to the weighted squared distance of the data points
+            to their respectively nearest already sampled centroid """
+
+        weights = np.ones(len(data)) if self._weights is None else self._weights.astype(np.float64)
+        centroids = np.empty((n, data.shape[1]))
+        squared_distances = np.full(len(data), np.inf)
+
+        probabilities = weights
+        for i in range(n):
+            centroids[i] = data[np.random.choice(len(data), p=probabilities / probabilities.sum())]
+            squared_distances = np.minimum(squared_distances, self._squared_distances(data, centroids[i]))
+
+            # resort to weights once all data points coincide with a centroid
+            probabilities = weights * squared_distances
+            if not probabilities.any():
+                probabilities = weights
+
+        return centroids
 
-    def __call__(self, _previous_clusters: Optional[_ClusterComposition] = None) -> _ClusterComposition:
+    def _squared_distances(self, data: np.ndarray, centroid: np.ndarray) -> np.ndarray:
+        squared_distances = np.empty(len(data))
+        for start in range(0, len(data), self._chunk_size):
+            squared_distances[start:start + self._chunk_size] = np.square(data[start:start + self._chunk_size] - centroid).sum(axis=1)
+        return squared_distances
+
+    @kick_off_message_displayer('Clustering...', stage_name='clustering', count=len)
+    def __call__(self) -> np.ndarray:
         """ Conduct kMeans clustering iterations, until either no data point assignment
             change having taken place throughout clustering with respect to the
-            corresponding previous cluster composition, or number of max iterations
-            reached
+            corresponding previous labels, or number of max iterations reached
+
+            Returns:
+                labels of shape (n_data_points, ), comprising the cluster index of each data point,
+                the centroids being set to the means of the thereby defined clusters """
+
+        self.labels = self._cluster()
+
+        while True:
+            self._adjust_centroids(self.labels)
+            previous_labels, self.labels = self.labels, self._cluster()
+
+            if np.array_equal(previous_labels, self.labels) or self.n_conducted_iterations >= self._max_iterations:
+                break
+
+        self._adjust_centroids(self.labels)
+        self._finish()
 
-            Args:
-                _previous_clusters: recursion arg, not to be passed at invocation """
+        return self.labels
 
-        if _previous_clusters is not None:
-            self._adjust_centroids(_previous_clusters)
+    def _finish(self):
+        self.inertia = self._estimate_inertia()
+        print(f'Finished after {self.n_conducted_iterations} iterations with an estimated inertia of {self.inertia:.4g}')
 
-        new_clusters = self._cluster()
+    def _estimate_inertia(self, sample_size=INERTIA_SAMPLE_SIZE) -> float:
+        """ Estimates the (weighted) sum of squared distances of the data points to their
+            assigned centroids on a sample of sample_size data points, drawn by means of a
+            dedicated, fixedly seeded rng in order to leave the global one untouched
 
-        if _previous_clusters is None or (self._clusters_divergent(_previous_clusters, new_clusters) and self.n_conducted_iterations < self._max_iterations):
-            return self.__call__(new_clusters)
+            Returns:
+                inertia estimate, extrapolated to the entirety of data points """
 
-        print(f'Finished after {self.n_conducted_iterations} iterations')
-        return new_clusters
+        indices = np.random.RandomState(0).randint(0, len(self._data), size=min(sample_size, len(self._data)))
+        squared_distances = np.square(self._data[indices] - self.centroids[self.labels[indices]]).sum(axis=1)
 
-    def _cluster(self) -> _ClusterComposition:
+        if self._weights is None:
+            return float(squared_distances.mean() * len(self._data))
+        return float(np.mean(squared_distances * self._weights[indices]) * len(self._data))
+
+    def _cluster(self) -> np.ndarray:
         self._progress_bar.set_description(f'Conducting {ordinal_number(self.n_conducted_iterations + 1)} clustering iteration', refresh=True)
 
         # assign data points to clusters
-        clusters = [[] for _ in range(self._n_clusters)]
-        for data_point in self._data:
-            corresponding_centroid_distances = list(map(lambda centroid: euclidean_distance(data_point, centroid), self._centroids))
-            clusters[np.argmin(corresponding_centroid_distances)].append(data_point)
+        labels = nearest_centroids(self._data, self.centroids, chunk_size=self._chunk_size)
 
         # increment iteration number monitoring attributes
         self._progress_bar.update(1)
         self.n_conducted_iterations += 1
 
-        return clusters
+        return labels
 
-    def _adjust_centroids(self, clusters: _ClusterComposition):
-        self._centroids = [np.mean(cluster, axis=0) for cluster in clusters]
+    def _adjust_centroids(self, labels: np.ndarray):
+        """ Sets centroids to the weighted means of their assigned data points, whilst
+            leaving the ones of empty clusters untouched """
 
-    @staticmethod
-    def _clusters_divergent(a: _ClusterComposition, b: _ClusterComposition) -> bool:
-        """ Returns True if samples contained within any pair a_i and b_i diverge from
-            one another regardless of their indices """
+        counts = np.zeros(self._n_clusters)
+        sums = np.zeros_like(self.centroids)
+
+        for start in range(0, len(self._data), self._chunk_size):
+            chunk_labels = labels[start:start + self._chunk_size]
+            chunk_data = self._data[start:start + self._chunk_size].astype(np.float64)
+
+            if self._weights is not None:
+                chunk_weights = self._weights[start:start + self._chunk_size]
+                chunk_data *= chunk_weights[:, np.newaxis]
+            else:
+                chunk_weights = None
+
+            counts += np.bincount(chunk_labels, weights=chunk_weights, minlength=self._n_clusters)
+            for dimension in range(sums.shape[1]):
+                sums[:, dimension] += np.bincount(chunk_labels, weights=chunk_data[:, dimension], minlength=self._n_clusters)
+
+        non_empty = counts > 0
+        self.centroids[non_empty] = sums[non_empty] / counts[non_empty, np.newaxis]
+
+
+class MiniBatchKMeansClusterer(KMeansClusterer):
+    """ Fits the centroids on random mini-batches of batch_size data points, drawn proportionally
+        to the data point weights, each centroid being moved towards the mean of its assigned
+        batch data points at a learning rate decaying with the total number of data points
+        having been assigned to it so far, followed by a single full assignment pass
+
+        The cost of an iteration thus being independent of the number of data points, the
+        clustering time doesn't grow with iterations × data points any longer """
+
+    def __init__(self,
+                 *args,
+                 batch_size=BATCH_SIZE,
+                 tolerance=1e-2,
+                 assignment: Callable[[np.ndarray, np.ndarray], np.ndarray] = nearest_centroids,
+                 **kwargs):
+        """ Args:
+                batch_size: number of data points per mini-batch
+                tolerance: maximal centroid shift throughout an iteration, below which
+                    the clustering is deemed to have converged
+                assignment: function of data and centroids, returning the labels of the
+                    final full assignment pass """
+
+        super().__init__(*args, **kwargs)
+
+        self._batch_size: int = batch_size
+        self._tolerance: float = tolerance
+        self._assignment: Callable[[np.ndarray, np.ndarray], np.ndarray] = assignment
+
+    @kick_off_message_displayer('Clustering mini-batch-wise...', stage_name='minibatch_clustering', count=len)
+    def __call__(self) -> np.ndarray:
+        """ Conduct mini-batch iterations until either the centroids having stopped moving,
+            or number of max iterations reached, and assign all data points subsequently
+
+            Returns:
+                labels of shape (n_data_points, ), comprising the cluster index of each data point """
+
+        cumulative_weights = None if self._weights is None else np.cumsum(self._weights, dtype=np.float64)
+        assigned_counts = np.zeros(self._n_clusters)
+
+        while self.n_conducted_iterations < self._max_iterations:
+            self._progress_bar.set_description(f'Conducting {ordinal_number(self.n_conducted_iterations + 1)} mini-batch iteration', refresh=True)
+
+            # draw batch
+            if cumulative_weights is None:
+                batch_indices = np.random.randint(0, len(self._data), size=self._batch_size)
+            else:
+                batch_indices = np.searchsorted(cumulative_weights, np.random.random(self._batch_size) * cumulative_weights[-1], side='right')
+            batch = self._data[batch_indices].astype(np.float64)
+
+            # move centroids towards the means of their assigned batch data points
+            batch_labels = nearest_centroids(batch, self.centroids, chunk_size=self._chunk_size)
+            batch_counts = np.bincount(batch_labels, minlength=self._n_clusters)
+            batch_sums = np.stack([np.bincount(batch_labels, weights=batch[:, dimension], minlength=self._n_clusters) for dimension in range(batch.shape[1])], axis=1)
+
+            assigned_counts += batch_counts
+            assigned = batch_counts > 0
+            shifts = (batch_sums[assigned] - batch_counts[assigned, np.newaxis] * self.centroids[assigned]) / assigned_counts[assigned, np.newaxis]
+            self.centroids[assigned] += shifts
+
+            # increment iteration number monitoring attributes
+            self._progress_bar.update(1)
+            self.n_conducted_iterations += 1
+
+            if not len(shifts) or np.abs(shifts).max() < self._tolerance:
+                break
+
+        self._progress_bar.set_description('Assigning data points', refresh=True)
+        self.labels = self._assignment(self._data, self.centroids)
+        self._finish()
 
-        for ith_clusters in itertools.zip_longest(a, b):
-            if not np.array_equal(*map(lambda cluster: np.sort(cluster, axis=0), ith_clusters)):
-                return True
-        return False
+        return self.labels
 
 
 if __name__ == '__main__':
@@ -108,9 +297,9 @@ if __name__ == '__main__':
 
     # example_data = np.random.randint(0, 100, (50, 2))
     # clusterer = KMeansClusterer(example_data, n_clusters=3, max_iterations=5)
-    # clusters = clusterer.__call__()
+    # labels = clusterer()
 
-    # for cluster in clusters:
-    #     plt.scatter(*cluster.T)
+    # for cluster_index in range(3):
+    #     plt.scatter(*example_data[labels == cluster_index].T)
     #
     # plt.show()
\ No newline at end of file
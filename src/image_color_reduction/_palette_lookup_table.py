@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+from typing import Dict, Tuple
+from collections import OrderedDict
+
+from src.image_color_reduction._k_means_clustering import nearest_centroids
+from src.utils import lazy_import
+
+np = lazy_import('numpy')
+
+
+# number of pixels being looked up at once
+CHUNK_SIZE = 2 ** 20
+
+# number of cells whose palette color distances are computed at once
+_CELL_CHUNK_SIZE = 2 ** 12
+
+_CACHE_SIZE = 8
+
+
+class PaletteLookupTable:
+    """ Quantized color space lookup table mapping 8-bit colors onto the index of their
+        nearest palette color, thus reducing the assignment of pixels to a single gather
+
+        Each channel is quantized to its n_bits most significant bits, resulting in cells
+        of 2 ** (8 - n_bits) values per channel. Cells which might be intersected by a
+        boundary between the voronoi regions of two palette colors, i.e. the ones whose
+        center's distance to the second nearest palette color doesn't exceed its distance
+        to the nearest one by at least the cell diameter, are resolved exactly per pixel """
+
+    def __init__(self, palette: np.ndarray, n_bits=6):
+        """ Args:
+                palette: array of shape (n_colors, n_channels)
+                n_bits: number of most significant bits per channel determining the table
+                    resolution, resulting in (2 ** n_bits) ** n_channels cells """
+
+        self._palette: np.ndarray = palette.astype(np.float64)
+        self._n_bits: int = n_bits
+        self._shift: int = 8 - n_bits
+
+        n_channels = palette.shape[1]
+        cell_size = 2 ** self._shift
+
+        # centers of all cells of shape (n_cells, n_channels), ordered like the flat cell indices
+        cell_indices = np.indices((2 ** n_bits, ) * n_channels).reshape(n_channels, -1).T
+        cell_centers = cell_indices * cell_size + (cell_size - 1) / 2
+
+        self._labels: np.ndarray = np.empty(len(cell_centers), dtype=np.min_scalar_type(len(palette) - 1))
+        self._ambiguous: np.ndarray = np.zeros(len(cell_centers), dtype=bool)
+
+        cell_diameter = np.sqrt(n_channels) * (cell_size - 1)
+        for start in range(0, len(cell_centers), _CELL_CHUNK_SIZE):
+            distances = np.sqrt(np.square(cell_centers[start:start + _CELL_CHUNK_SIZE, np.newaxis, :] - self._palette[np.newaxis]).sum(axis=2))
+            self._labels[start:start + _CELL_CHUNK_SIZE] = distances.argmin(axis=1)
+
+            if len(palette) > 1:
+                nearest_two = np.partition(distances, 1, axis=1)[:, :2]
+                self._ambiguous[start:start + _CELL_CHUNK_SIZE] = nearest_two[:, 1] - nearest_two[:, 0] <= cell_diameter
+
+    def __call__(self, pixels: np.ndarray) -> np.ndarray:
+        """ Args:
+                pixels: uint8 array of shape (n_pixels, n_channels)
+
+            Returns:
+                palette indices of shape (n_pixels, ) """
+
+        labels = np.empty(len(pixels), dtype=self._labels.dtype)
+
+        for start in range(0, len(pixels), CHUNK_SIZE):
+            chunk = pixels[start:start + CHUNK_SIZE]
+
+            cell_indices = np.zeros(len(chunk), dtype=np.intp)
+            for channel in range(chunk.shape[1]):
+                cell_indices <<= self._n_bits
+                cell_indices |= chunk[:, channel] >> self._shift
+
+            chunk_labels = self._labels[cell_indices]
+
+            # resolve pixels residing in cells near voronoi boundaries exactly
+            ambiguous = self._ambiguous[cell_indices]
+            if ambiguous.any():
+                chunk_labels[ambiguous] = nearest_centroids(chunk[ambiguous], self._palette)
+
+            labels[start:start + CHUNK_SIZE] = chunk_labels
+
+        return labels
+
+
+_cache: Dict[Tuple[bytes, Tuple[int, ...], int], PaletteLookupTable] = OrderedDict()
+
+
+def palette_lookup_table(palette: np.ndarray, n_bits=6) -> PaletteLookupTable:
+    """ Returns:
+            lookup table of palette, reused for identical palettes throughout the
+            processing of multiple images, the most recently used ones being cached """
+
+    key = (palette.astype(np.float64).tobytes(), palette.shape, n_bits)
+
+    if key in _cache:
+        _cache.move_to_end(key)
+    else:
+        _cache[key] = PaletteLookupTable(palette, n_bits=n_bits)
+        if len(_cache) > _CACHE_SIZE:
+            _cache.popitem(last=False)
+
+    return _cache[key]
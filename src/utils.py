@@ -1,51 +1,280 @@
 import os
-from typing import Tuple, Type, Optional, Any, Callable
+import sys
+from types import ModuleType
+from typing import Tuple, Type, Optional, Any, Callable, Dict, Iterator, List, Sequence
+from contextlib import contextmanager
 import argparse
 import functools
+import importlib.util
+import time
+import traceback
 
-from tqdm import tqdm
+
+# directory mode options as parsed by parse_args, serving as defaults of run and directory_file_paths
+_directory_options: Dict[str, Any] = {'recursive': False, 'file_extensions': None, 'n_workers': None}
+
+# environment variable holding the path of the stage log, being inherited by worker processes
+STAGE_LOG_ENV_VAR = 'SCRIPT_COLLECTION_STAGE_LOG'
+_stage_log_path: Optional[str] = os.environ.get(STAGE_LOG_ENV_VAR) or None
+
+
+def lazy_import(name: str) -> ModuleType:
+    """ Returns:
+            module of name, whose execution is being deferred until the first access of
+            one of its attributes, thus sparing code paths not requiring it, e.g. the
+            display of a cli's help, the import time of heavy dependencies such as cv2
+
+        Note that attribute accesses at module level, including the ones within
+        annotations, trigger the actual import as well, which is why modules assigning
+        lazily imported modules postpone the evaluation of their annotations """
+
+    if name in sys.modules:
+        return sys.modules[name]
+
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f'No module named {name!r}', name=name)
+    spec.loader = importlib.util.LazyLoader(spec.loader)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
 
 
 def parse_args(*arguments: Tuple[str, str, Type, str, Optional[Any]], include_dir_argument=False):
     """ Arguments arguments, listed chronologically:
             shorthand cli invocation keyword
             cli invocation keyword
-            option type
+            option type, bool resulting in a flag
             help description
-            default value """
+            default value
+
+        Args:
+            include_dir_argument: add directory path option as well as the options concerning
+                the file discovery and parallelization of run in directory mode """
 
     parser = argparse.ArgumentParser()
 
     if include_dir_argument:
-        arguments += (('-d', '--dir', str, 'directory path', None), )
+        arguments += (
+            ('-d', '--dir', str, 'directory path', None),
+            ('-r', '--recursive', bool, 'directory mode: process files residing in subdirectories as well', False),
+            ('-e', '--extensions', str, 'directory mode: comma-separated extensions, e.g. png,jpg, files are to be filtered by', None),
+            ('-nw', '--workers', int, 'directory mode: number of worker processes files are distributed across; sequential processing if not passed, unless stated otherwise', None)
+        )
+    arguments += (('-sl', '--stagelog', str, f'path of .csv or .jsonl file wall time, cpu time, peak memory usage and number of items of each stage shall be appended to, alternatively settable via {STAGE_LOG_ENV_VAR}', None), )
 
     for arg in arguments:
-        parser.add_argument(*arg[:2], type=arg[2], help=arg[3], default=arg[4])
+        # register bool typed arguments as flags
+        if arg[2] is bool:
+            parser.add_argument(*arg[:2], action='store_true', help=arg[3], default=arg[4])
+        else:
+            parser.add_argument(*arg[:2], type=arg[2], help=arg[3], default=arg[4])
+
+    args = parser.parse_args()
+
+    if include_dir_argument:
+        _directory_options.update(
+            recursive=args.recursive,
+            file_extensions=None if args.extensions is None else args.extensions.split(','),
+            n_workers=args.workers
+        )
+    if args.stagelog:
+        enable_stage_log(args.stagelog)
+
+    return args
+
+
+def enable_stage_log(path: str):
+    """ Causes the records of all subsequently completed stages, including the ones of
+        worker processes started afterwards, to be appended to the file at path """
+
+    global _stage_log_path
+    _stage_log_path = os.environ[STAGE_LOG_ENV_VAR] = path
+
+
+class StageRecord:
+    """ Measurements of a single execution of a stage
+
+        Peak RSS denotes the high-water mark of the process's resident memory at the end of
+        the stage, which isn't resettable and hence may stem from a preceding stage, whereas
+        the traced peak, solely being recorded if tracemalloc is tracing, e.g. due to
+        python -X tracemalloc, denotes the peak of the memory allocated via Python's and
+        numpy's allocators throughout the stage itself. CPU time comprises the one of all
+        threads of the process, however not the one of child processes """
+
+    FIELDS = ('stage', 'pid', 'started_at', 'wall_seconds', 'cpu_seconds', 'n_items', 'peak_rss_mb', 'traced_peak_mb')
+
+    __slots__ = ('stage', 'n_items', '_started_at', '_wall_start', '_cpu_start', '_traced_peak')
+
+    def __init__(self, stage: str, n_items: Optional[int] = None):
+        self.stage: str = stage
+        self.n_items: Optional[int] = n_items
+
+        self._started_at: float = time.time()
+        self._wall_start: float = time.perf_counter()
+        self._cpu_start: float = time.process_time()
+        self._traced_peak: Optional[int] = None
+
+    def as_row(self) -> Tuple[Any, ...]:
+        return (
+            self.stage,
+            os.getpid(),
+            round(self._started_at, 3),
+            round(time.perf_counter() - self._wall_start, 6),
+            round(time.process_time() - self._cpu_start, 6),
+            self.n_items,
+            _peak_rss_mb(),
+            None if self._traced_peak is None else round(self._traced_peak / 2 ** 20, 3)
+        )
+
+
+# records of the stages currently being executed, the innermost last
+_stage_stack: List[StageRecord] = []
+
+
+@contextmanager
+def stage(name: str, message: Optional[str] = None, n_items: Optional[int] = None) -> Iterator[StageRecord]:
+    """ Context manager displaying message, if passed, on entering and recording the
+        enclosed block as stage of name, whose record is being appended to the stage log
+        if the latter enabled by means of the --stagelog option or the STAGE_LOG_ENV_VAR
+        environment variable; the number of processed items may be set on the yielded
+        record throughout the block
+
+        >>> with stage('sorting') as record:
+        ...     record.n_items = len(sorted([3, 1, 2]))
+        >>> record.n_items
+        3
+        """
+
+    if message is not None:
+        print(message)
+
+    record = StageRecord(name, n_items=n_items)
+    if _stage_log_path is None:
+        yield record
+        return
+
+    import tracemalloc
+
+    # tracemalloc.reset_peak being available as of Python 3.9
+    tracing = tracemalloc.is_tracing() and hasattr(tracemalloc, 'reset_peak')
+    if tracing:
+        # fold the enclosing stage's peak hitherto into its record prior to resetting it,
+        # nested stages forwarding their peaks to the enclosing one at their end
+        if _stage_stack and _stage_stack[-1]._traced_peak is not None:
+            _stage_stack[-1]._traced_peak = max(_stage_stack[-1]._traced_peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+        record._traced_peak = 0
+
+    _stage_stack.append(record)
+    try:
+        yield record
+    finally:
+        _stage_stack.pop()
 
-    return parser.parse_args()
+    if tracing:
+        record._traced_peak = max(record._traced_peak, tracemalloc.get_traced_memory()[1])
+        if _stage_stack and _stage_stack[-1]._traced_peak is not None:
+            _stage_stack[-1]._traced_peak = max(_stage_stack[-1]._traced_peak, record._traced_peak)
 
+    _append_to_stage_log(record.as_row())
 
-def kick_off_message_displayer(message: str):
-    """ Display kick off message before execution of decorated function """
+
+def kick_off_message_displayer(message: str, stage_name: Optional[str] = None, count: Optional[Callable[[Any], int]] = None):
+    """ Display kick off message before execution of decorated function, recording the
+        latter as stage
+
+        Args:
+            stage_name: defaults to the name of the decorated function
+            count: function determining the number of processed items from the return value
+                of the decorated function, solely being invoked if the stage log is enabled """
 
     def decorator(func):
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
-            print(message)
-            return func(*args, **kwargs)
+            with stage(stage_name or func.__name__, message) as record:
+                result = func(*args, **kwargs)
+                if count is not None and _stage_log_path is not None:
+                    record.n_items = count(result)
+            return result
         return wrapper
     return decorator
 
 
-def run(main: Callable[[str], None], file_path: Optional[str], directory_path: Optional[str]):
+def _peak_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    # ru_maxrss is denoted in bytes on macOS and in kilobytes elsewhere
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (2 ** 20 if sys.platform == 'darwin' else 2 ** 10), 3)
+
+
+def _append_to_stage_log(row: Tuple[Any, ...]):
+    """ Appends row as csv line if the stage log path ends on .csv, as json line otherwise,
+        each by means of a single write in order for rows of concurrent processes not to
+        interleave """
+
+    if _stage_log_path.lower().endswith('.csv'):
+        import csv
+        import io
+
+        line = io.StringIO()
+        csv.writer(line).writerow(row)
+        with open(_stage_log_path, 'a', newline='') as f:
+            f.write((','.join(StageRecord.FIELDS) + '\r\n' if not f.tell() else '') + line.getvalue())
+    else:
+        import json
+
+        with open(_stage_log_path, 'a') as f:
+            f.write(json.dumps(dict(zip(StageRecord.FIELDS, row))) + '\n')
+
+
+def directory_file_paths(directory_path: str, recursive: Optional[bool] = None, file_extensions: Optional[Sequence[str]] = None) -> List[str]:
+    """ Args:
+            recursive: include files residing in subdirectories, defaults to the parsed option
+            file_extensions: case-insensitive extensions without leading dot files are to be
+                filtered by, defaults to the parsed option, all files being included if neither set
+
+        Returns:
+            sorted paths of the files residing in directory_path """
+
+    recursive = _directory_options['recursive'] if recursive is None else recursive
+    file_extensions = _directory_options['file_extensions'] if file_extensions is None else file_extensions
+
+    if recursive:
+        file_paths = [os.path.join(dir_path, file_name) for dir_path, _, file_names in os.walk(directory_path) for file_name in file_names]
+    else:
+        file_paths = [path for path in (os.path.join(directory_path, file_name) for file_name in os.listdir(directory_path)) if os.path.isfile(path)]
+
+    if file_extensions:
+        extensions = {extension.lower().lstrip('.') for extension in file_extensions}
+        file_paths = [path for path in file_paths if os.path.splitext(path)[1][1:].lower() in extensions]
+
+    return sorted(file_paths)
+
+
+def run(main: Callable[[str], None], file_path: Optional[str], directory_path: Optional[str], n_workers: Optional[int] = None, **discovery_kwargs):
     """ Runs main either over all files within passed dir in case of dir path
         reception or over passed file path respectively
 
+        In directory mode, errors raised by main are being captured per file and
+        summarized at the end instead of aborting the entire run. Files may be processed
+        by a pool of worker processes, the UPPER_CASE module globals of main, i.e. its cli
+        configuration, being transferred to the latter such that they're available
+        regardless of the process start method; state altered by main within a worker,
+        however, isn't shared with other workers
+
         Args:
             main: execution function, to receive merely an absolute file path argument and
                 not to return anything
             file_path: leading to file main shall be run against
             directory_path: comprising files all of which main shall be run against
+            n_workers: number of worker processes, defaults to the parsed option, main being
+                run in the current process if neither set
+            discovery_kwargs: recursive, file_extensions, as passed to directory_file_paths
 
         Raises:
             AttributeError on either the absence of either file_path or directory_path or
@@ -54,10 +283,52 @@ def run(main: Callable[[str], None], file_path: Optional[str], directory_path: O
     if all([file_path, directory_path]) or not any([file_path, directory_path]):
         raise AttributeError('Pass either file path or directory path')
 
-    if directory_path:
-        progress_bar = tqdm(os.listdir(directory_path))
-        for file in progress_bar:
-            progress_bar.set_description(f'Processing {file}', refresh=True)
-            main(os.path.join(directory_path, file))
+    if not directory_path:
+        main(file_path)
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+    from tqdm import tqdm
+
+    file_paths = directory_file_paths(directory_path, **discovery_kwargs)
+    n_workers = _directory_options['n_workers'] if n_workers is None else n_workers
+
+    progress_bar = tqdm(file_paths)
+    if n_workers:
+        executor = ProcessPoolExecutor(n_workers, initializer=_initialize_worker, initargs=(main, {name: value for name, value in main.__globals__.items() if name.isupper()}))
+        errors = executor.map(functools.partial(_fault_isolated, main), file_paths)
     else:
+        executor, errors = None, map(functools.partial(_fault_isolated, main), file_paths)
+
+    # display progress in order of file paths
+    failures = []
+    for path, error in zip(file_paths, errors):
+        progress_bar.set_description(f'Processed {os.path.relpath(path, directory_path)}', refresh=False)
+        progress_bar.update()
+
+        if error is not None:
+            failures.append((path, error))
+            progress_bar.write(f'Failed to process {path}:\n{error}')
+
+    progress_bar.close()
+    if executor is not None:
+        executor.shutdown()
+
+    print(f'Processed {len(file_paths) - len(failures)} out of {len(file_paths)} files successfully')
+    for path, error in failures:
+        print(f'Failed: {path}: {error.strip().splitlines()[-1]}')
+
+
+def _initialize_worker(main: Callable[[str], None], global_variables: Dict[str, Any]):
+    main.__globals__.update(global_variables)
+
+
+def _fault_isolated(main: Callable[[str], None], file_path: str) -> Optional[str]:
+    """ Returns:
+            formatted traceback of the exception raised by main if any, None otherwise """
+
+    try:
         main(file_path)
+    except Exception:
+        return traceback.format_exc()
+    return None
@@ -1,46 +1,114 @@
-from typing import List
+from __future__ import annotations
 
-import cv2
-import numpy as np
-from tqdm import tqdm
+from typing import Iterable, Iterator, List, Optional, Tuple
 
+from src.video_lag_stripper._change_detection import ChangeDetector
+from src.video_lag_stripper._pipeline import Pipeline
+from src.utils import lazy_import
 
-def consecutive_frames_of_insufficient_rate_of_change_stripped(video_capture: cv2.VideoCapture, n_frames_original: int) -> List[np.ndarray]:
+cv2 = lazy_import('cv2')
+np = lazy_import('numpy')
+
+
+def consecutive_frames_of_insufficient_rate_of_change_stripped(video_capture: cv2.VideoCapture, n_frames_original: int, detector: Optional[ChangeDetector] = None, pipeline: Optional[Pipeline] = None, consecutive_scores: Optional[List[float]] = None) -> List[np.ndarray]:
     """ Maintains merely consecutive frames of rate of pixel change
         bigger than heuristically determined treshold
 
+        Args:
+            detector: change detector determining whether frames differ sufficiently,
+                defaults to one of default settings
+            pipeline: pipeline decoding the frames and recording the stage throughputs,
+                defaults to a sequential one
+            consecutive_scores: list the rate of change of each frame with respect to its
+                predecessor is being appended to if passed, the first frame's being inf
+
         Returns:
             list of filtered frames """
 
-    MIN_RATE_OF_CHANGE = 0.20
+    return [frame for _, frame in _distinct_frames(video_capture, n_frames_original, detector or ChangeDetector(), pipeline or Pipeline(), consecutive_scores)]
 
-    _, last_distinct_frame = video_capture.read()
 
-    distinct_frames = []
+def distinct_frame_indices(video_capture: cv2.VideoCapture, n_frames_original: int, detector: Optional[ChangeDetector] = None, pipeline: Optional[Pipeline] = None, consecutive_scores: Optional[List[float]] = None) -> List[int]:
+    """ Analysis pass determining the frames which would be maintained by
+        consecutive_frames_of_insufficient_rate_of_change_stripped, without
+        holding any frame but the last distinct one in memory
 
-    i, p_bar = 0, tqdm(total=n_frames_original)
-    while True:
-        i += 1
+        Returns:
+            ascending indices of filtered frames """
+
+    return [i for i, _ in _distinct_frames(video_capture, n_frames_original, detector or ChangeDetector(), pipeline or Pipeline(), consecutive_scores)]
+
+
+def _distinct_frames(video_capture: cv2.VideoCapture, n_frames_original: int, detector: ChangeDetector, pipeline: Pipeline, consecutive_scores: Optional[List[float]] = None) -> Iterator[Tuple[int, np.ndarray]]:
+    """ Yields:
+            index, frame of the first frame as well as of every one being distinct
+            from the last distinct frame, or its predecessor if detector consecutive """
 
+    frames = pipeline.decoded(read_frames(video_capture))
+
+    frame = next(frames, None)
+    if frame is None:
+        return
+
+    with pipeline.timed('analysis'):
+        last_distinct_frame = previous_frame = detector.prepare(frame)
+    if consecutive_scores is not None:
+        consecutive_scores.append(float('inf'))
+    yield 0, frame
+
+    from tqdm import tqdm
+    p_bar = tqdm(total=n_frames_original)
+    for i, frame in enumerate(frames, start=1):
         p_bar.set_description(f'Processing frame {i}')
         p_bar.update(1)
 
-        success, frame = video_capture.read()
+        with pipeline.timed('analysis'):
+            prepared_frame = detector.prepare(frame)
+            rate_of_change = detector.rate_of_change(prepared_frame, last_distinct_frame)
 
-        if not success:
-            break
+            if consecutive_scores is not None:
+                consecutive_scores.append(rate_of_change if previous_frame is last_distinct_frame else detector.rate_of_change(prepared_frame, previous_frame))
+            previous_frame = prepared_frame
+
+        if rate_of_change >= detector.min_rate_of_change:
+            last_distinct_frame = prepared_frame
+            yield i, frame
+        elif detector.consecutive:
+            last_distinct_frame = prepared_frame
+
+    p_bar.close()
 
-        if _rate_of_change(frame, last_distinct_frame) >= MIN_RATE_OF_CHANGE:
-            distinct_frames.append(last_distinct_frame)
-            last_distinct_frame = frame
 
-    distinct_frames.append(last_distinct_frame)
-    return distinct_frames
+def read_frames(video_capture: cv2.VideoCapture, frame_indices: Optional[Iterable[int]] = None) -> Iterator[np.ndarray]:
+    """ Sequentially reads video_capture, merely decoding and retrieving the frames
+        at ascending frame_indices whilst solely grabbing the remaining ones
 
+        Args:
+            frame_indices: indices of the frames to be read, all frames being read if not passed
 
-def _rate_of_change(frame1: np.ndarray, frame2: np.ndarray) -> float:
-    diff = cv2.absdiff(frame1, frame2).astype(np.uint8)
-    return np.count_nonzero(diff) / diff.size
+        Yields:
+            frames at frame_indices """
+
+    if frame_indices is None:
+        while True:
+            success, frame = video_capture.read()
+            if not success:
+                return
+            yield frame
+
+    i = -1
+    for frame_index in frame_indices:
+        while i < frame_index - 1:
+            if not video_capture.grab():
+                return
+            i += 1
+
+        success, frame = video_capture.read()
+        if not success:
+            return
+        i += 1
+
+        yield frame
 
 
 def get_write_path(path: str, video_format='avi') -> str:
@@ -66,14 +134,25 @@ def new_fps(original_fps: int, n_frames_original: int, n_frames_new: int) -> int
     return int(original_fps - original_fps * n_frames_new / n_frames_original)
 
 
-def write_video(frames: List[np.ndarray], fps: int, write_path: str):
-    height, width = frames[0].shape[:2]
-    video = cv2.VideoWriter(write_path, cv2.VideoWriter_fourcc(*"XVID"), fps, (width, height))
+def write_video(frames: Iterable[np.ndarray], fps: int, write_path: str, pipeline: Optional[Pipeline] = None):
+    """ Args:
+            frames: frames to be written, may be lazily produced in order to
+                write them as they're being selected
+            pipeline: pipeline encoding the frames, defaults to a sequential one; the
+                encoding is merely threaded if frames being lazily produced, as it
+                wouldn't overlap with anything otherwise """
+
+    print(f'Writing stripped video to {write_path} with {fps} fps...')
+
+    overlapping = isinstance(frames, Iterator)
+    frames = iter(frames)
+    first_frame = next(frames)
 
+    height, width = first_frame.shape[:2]
+    video = (pipeline or Pipeline()).writer(cv2.VideoWriter(write_path, cv2.VideoWriter_fourcc(*"XVID"), fps, (width, height)), overlapping=overlapping)
+
+    video.write(first_frame)
     for frame in frames:
         video.write(frame)
 
-    print(f'Writing stripped video to {write_path} with {fps} fps...')
-
-    cv2.destroyAllWindows()
     video.release()
@@ -4,19 +4,65 @@
     Video audio will not be passed along to the delagged file. 
 
     The absolute video file path is to be passed by means of the -p or --path option during 
-    program command line invocation """
+    program command line invocation 
 
-import cv2
+    In streaming mode, the frames to be maintained are determined by a first analysis pass
+    recording merely their indices, whereupon a second pass writes them as they're being
+    decoded, such that memory consumption is bounded by a few frames instead of by the
+    video length 
+
+    Frames are compared by means of downscaled grayscale versions with a per-pixel tolerance
+    suppressing compression noise, optionally downscaled by area averaging instead of the faster
+    bilinear interpolation and optionally scoring the fraction of changed blocks instead of the
+    one of changed pixels; the thresholds are passable as cli options 
+
+    Decoding and encoding may be run on threads of their own, connected to the stage consuming
+    or producing the frames by bounded queues, the throughput of each stage being displayed at
+    the end. Since the output fps depend on the number of maintained frames, the stages merely
+    overlap in pairs, that is decoding with the analysis and, in streaming mode, decoding with
+    encoding, whereas frames held in memory are encoded on the main thread 
+
+    Long videos may be analyzed by multiple processes, each of which seeking to a segment
+    of its own, the final write being conducted in the manner of the streaming mode 
+
+    Frames may alternatively be compared with their predecessors instead of with the last
+    distinct frame, such that gradual changes don't accumulate
+
+    The rate of change of each frame with respect to its predecessor is persisted in a sidecar
+    file next to the video by every sequential analysis, being reused by subsequent runs in
+    order to preview the numbers of maintained frames for multiple thresholds, or to select
+    the frames to be maintained without any analysis pass, such that merely the final write
+    entails decoding. Both are exact merely for the consecutive comparison, which is why the
+    preview is otherwise labeled as approximate, whereas the selection requires the latter.
+    Sidecar files residing in a passed directory are skipped """
+
+from __future__ import annotations
+
+from typing import List
 
 from src.video_lag_stripper import (
     consecutive_frames_of_insufficient_rate_of_change_stripped,
+    distinct_frame_indices,
     get_write_path,
+    read_frames,
     write_video,
     new_fps
 )
+from src.video_lag_stripper._change_detection import ChangeDetector, MIN_RATE_OF_CHANGE
+from src.video_lag_stripper._pipeline import Pipeline
+from src.video_lag_stripper._score_sidecar import distinct_frame_indices_from_scores, is_sidecar, load_scores, save_scores
+from src.video_lag_stripper._segment_analysis import segment_parallel_distinct_frame_indices
+from src.utils import lazy_import, stage
+
+cv2 = lazy_import('cv2')
+np = lazy_import('numpy')
 
 
 def main(file_path: str):
+    if is_sidecar(file_path):
+        print(f'Skipping score sidecar {file_path}')
+        return
+
     # provide video capture, retrieve/compute variables
     video_capture = cv2.VideoCapture(file_path)
 
@@ -24,29 +70,118 @@ def main(file_path: str):
     fps = video_capture.get(cv2.CAP_PROP_FPS)
     print(f'Original fps: {fps}')
 
-    # remove consecutive frames of insufficient rate of change
-    distinct_consecutive_frames = consecutive_frames_of_insufficient_rate_of_change_stripped(video_capture,
-                                                                                             n_frames_original=n_frames_original)
-
-    # write processed video
     write_path = get_write_path(file_path)
-    write_video(frames=distinct_consecutive_frames,
-                fps=new_fps(fps, n_frames_original, len(distinct_consecutive_frames)), write_path=write_path)
+    pipeline = Pipeline(threaded=THREADED, queue_size=QUEUE_SIZE)
+    consecutive_scores: List[float] = []
+
+    # display numbers of frames which would be maintained at the preview thresholds
+    if PREVIEW_THRESHOLDS:
+        scores = _consecutive_scores(file_path, video_capture, n_frames_original, pipeline)
+        video_capture.release()
+
+        # the consecutive rates of change merely determine the frames a consecutive detector maintains
+        if not DETECTOR.consecutive:
+            print('Approximating numbers of maintained frames by rates of change with respect to preceding frames, '
+                  'the analysis comparing against the last distinct frame instead, which may maintain considerably more frames; pass --consecutive for exact numbers')
+
+        for threshold in PREVIEW_THRESHOLDS:
+            n_frames_new = len(distinct_frame_indices_from_scores(scores, threshold))
+            print(f'Threshold {threshold}: maintaining {"" if DETECTOR.consecutive else "approximately "}{n_frames_new} of {len(scores)} frames at {new_fps(fps, n_frames_original, n_frames_new)} fps')
+        return
+
+    if FROM_SCORES or STREAMING or N_PROCESSES:
+        # determine indices of frames of sufficient rate of change
+        with stage('analysis', n_items=n_frames_original):
+            if FROM_SCORES:
+                frame_indices = distinct_frame_indices_from_scores(_consecutive_scores(file_path, video_capture, n_frames_original, pipeline), DETECTOR.min_rate_of_change)
+            elif N_PROCESSES:
+                frame_indices = segment_parallel_distinct_frame_indices(file_path, n_frames_original=n_frames_original, detector=DETECTOR, n_workers=N_PROCESSES)
+            else:
+                frame_indices = distinct_frame_indices(video_capture, n_frames_original=n_frames_original, detector=DETECTOR, pipeline=pipeline, consecutive_scores=consecutive_scores)
+        video_capture.release()
+        n_frames_new = len(frame_indices)
+
+        # write processed video whilst decoding it anew
+        video_capture = cv2.VideoCapture(file_path)
+        with stage('writing', n_items=n_frames_new):
+            write_video(frames=pipeline.decoded(read_frames(video_capture, frame_indices), frame_indices),
+                        fps=new_fps(fps, n_frames_original, n_frames_new), write_path=write_path, pipeline=pipeline)
+    else:
+        # remove consecutive frames of insufficient rate of change
+        with stage('analysis', n_items=n_frames_original):
+            distinct_consecutive_frames = consecutive_frames_of_insufficient_rate_of_change_stripped(video_capture,
+                                                                                                     n_frames_original=n_frames_original,
+                                                                                                     detector=DETECTOR,
+                                                                                                     pipeline=pipeline,
+                                                                                                     consecutive_scores=consecutive_scores)
+        n_frames_new = len(distinct_consecutive_frames)
+
+        # write processed video
+        with stage('writing', n_items=n_frames_new):
+            write_video(frames=distinct_consecutive_frames,
+                        fps=new_fps(fps, n_frames_original, n_frames_new), write_path=write_path, pipeline=pipeline)
+
+    video_capture.release()
+    pipeline.report()
+
+    if consecutive_scores:
+        save_scores(file_path, DETECTOR, consecutive_scores)
 
     # display number of discarded frames
-    n_discarded_frames = n_frames_original - len(distinct_consecutive_frames)
+    n_discarded_frames = n_frames_original - n_frames_new
     print(f'Discarded {n_discarded_frames} frames, equaling {n_discarded_frames / n_frames_original * 100:.3f}%')
 
 
+def _consecutive_scores(file_path: str, video_capture: cv2.VideoCapture, n_frames_original: int, pipeline: Pipeline) -> np.ndarray:
+    """ Returns:
+            consecutive rates of change of all frames, loaded from the sidecar if up to date,
+            determined by an analysis pass and persisted otherwise """
+
+    scores = load_scores(file_path, DETECTOR)
+
+    if scores is None:
+        consecutive_scores = []
+        with stage('scoring', n_items=n_frames_original):
+            distinct_frame_indices(video_capture, n_frames_original=n_frames_original, detector=DETECTOR, pipeline=pipeline, consecutive_scores=consecutive_scores)
+        save_scores(file_path, DETECTOR, consecutive_scores)
+        scores = np.array(consecutive_scores, dtype=np.float32)
+    else:
+        print(f'Reusing frame scores of {file_path}')
+
+    return scores
+
+
 if __name__ == '__main__':
     from src.utils import parse_args, run
 
     args = parse_args(
         ('-p', '--path', str, 'path to the video file whose smoothness ought to be increased', None),
+        ('-s', '--streaming', bool, 'determine frames to be maintained in a first pass and write them whilst decoding the video anew in a second one, thus bounding memory consumption', False),
+        ('-t', '--threshold', float, 'fraction of changed pixels, or blocks respectively, from which on a frame is considered distinct', MIN_RATE_OF_CHANGE),
+        ('-tol', '--tolerance', int, 'absolute grayscale difference up to which a pixel, or block respectively, is considered unchanged', 8),
+        ('-sc', '--scale', float, 'factor frames are being downscaled by prior to their comparison', 0.25),
+        ('-bs', '--blocksize', int, 'edge length in downscaled pixels of the blocks whose mean difference is being compared; pixel-wise comparison if not passed', None),
+        ('-aa', '--areaaveraging', bool, 'downscale frames by averaging all covered pixels, suppressing noise more thoroughly than the default bilinear interpolation at the expense of speed', False),
+        ('-th', '--threaded', bool, 'decode frames, and encode them in streaming mode, on threads of their own, connected to the adjacent stage by bounded queues', False),
+        ('-q', '--queuesize', int, 'maximal number of frames buffered between two pipeline stages', 32),
+        ('-pr', '--processes', int, 'analyze video in as many segments by as many processes, implying the streaming mode write', None),
+        ('-c', '--consecutive', bool, 'compare frames with their predecessors instead of with the last distinct frame', False),
+        ('-pt', '--previewthresholds', str, 'comma-separated thresholds to display the numbers of maintained frames and resulting fps for, by means of the score sidecar, without writing any video; exact merely if consecutive', None),
+        ('-fs', '--fromscores', bool, "select frames by their score sidecar's rates of change with respect to their predecessors, instead of by an analysis pass; requires consecutive", False),
         include_dir_argument=True
     )
 
     FILE_PATH = args.path
     DIRECTORY_PATH = args.dir
+    STREAMING = args.streaming
+    THREADED = args.threaded
+    QUEUE_SIZE = args.queuesize
+    N_PROCESSES = args.processes
+    PREVIEW_THRESHOLDS = None if args.previewthresholds is None else list(map(float, args.previewthresholds.split(',')))
+    FROM_SCORES = args.fromscores
+    DETECTOR = ChangeDetector(min_rate_of_change=args.threshold, scale=args.scale, tolerance=args.tolerance, block_size=args.blocksize, consecutive=args.consecutive, area_averaging=args.areaaveraging)
+
+    if FROM_SCORES and not DETECTOR.consecutive:
+        raise AttributeError('Selecting frames by their score sidecar requires --consecutive, as it would otherwise deviate from the selection of the analysis')
 
     run(main, file_path=FILE_PATH, directory_path=DIRECTORY_PATH)
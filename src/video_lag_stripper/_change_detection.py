@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+from typing import Optional
+
+from src.utils import lazy_import
+
+cv2 = lazy_import('cv2')
+np = lazy_import('numpy')
+
+
+MIN_RATE_OF_CHANGE = 0.20
+
+
+class ChangeDetector:
+    """ Determines whether a frame differs sufficiently from a reference one by comparing
+        downscaled grayscale versions of both, a per-pixel tolerance suppressing compression
+        noise
+
+        The bilinear downscaling merely interpolates between the two by two source pixels
+        nearest to each target pixel, hence skipping the remaining ones at scales below 0.5
+        rather than smoothing them, whereas the optional area averaging takes the mean of all
+        source pixels covered by a target pixel, thus additionally suppressing noise at the
+        expense of a slower downscaling
+
+        The rate of change is either the fraction of pixels whose absolute difference
+        exceeds the tolerance, or, if a block size is set, the fraction of blocks whose
+        mean absolute difference does, the latter being more robust towards scattered
+        noise whilst still registering small localized changes, e.g. typed text
+
+        The reference frame is either the last distinct one, such that gradual changes
+        accumulate until a frame is considered distinct, or, if consecutive, the preceding
+        one, such that the decision regarding a frame depends solely on its predecessor """
+
+    def __init__(self, min_rate_of_change=MIN_RATE_OF_CHANGE, scale=0.25, tolerance=8, block_size: Optional[int] = None, consecutive=False, area_averaging=False):
+        """ Args:
+                min_rate_of_change: fraction of changed pixels or blocks from which on a frame
+                    is considered to be distinct from its reference
+                scale: factor frames are being downscaled by prior to their comparison
+                tolerance: absolute grayscale difference up to which a pixel or block is
+                    considered unchanged
+                block_size: edge length of the blocks in downscaled pixels; pixel-wise
+                    comparison if not set
+                consecutive: compare frames with their predecessors instead of with the
+                    last distinct frame
+                area_averaging: downscale by averaging all covered source pixels instead
+                    of by bilinear interpolation """
+
+        self.min_rate_of_change: float = min_rate_of_change
+        self.scale: float = scale
+        self.tolerance: int = tolerance
+        self.block_size: Optional[int] = block_size
+        self.consecutive: bool = consecutive
+        self.area_averaging: bool = area_averaging
+
+    def prepare(self, frame: np.ndarray) -> np.ndarray:
+        """ Returns:
+                downscaled grayscale frame, which is to be passed to rate_of_change """
+
+        if self.scale != 1:
+            frame = cv2.resize(frame, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA if self.area_averaging else cv2.INTER_LINEAR)
+        if frame.ndim == 3:
+            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        return frame
+
+    def rate_of_change(self, prepared_frame: np.ndarray, prepared_reference_frame: np.ndarray) -> float:
+        diff = cv2.absdiff(prepared_frame, prepared_reference_frame)
+
+        if self.block_size:
+            n_block_rows, n_block_columns = max(diff.shape[0] // self.block_size, 1), max(diff.shape[1] // self.block_size, 1)
+            diff = cv2.resize(diff[:n_block_rows * self.block_size, :n_block_columns * self.block_size], (n_block_columns, n_block_rows), interpolation=cv2.INTER_AREA)
+
+        return np.count_nonzero(diff > self.tolerance) / diff.size
+
+    def is_distinct(self, prepared_frame: np.ndarray, prepared_reference_frame: np.ndarray) -> bool:
+        return self.rate_of_change(prepared_frame, prepared_reference_frame) >= self.min_rate_of_change
@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+from typing import Dict, Iterable, Iterator, Optional, TypeVar
+from contextlib import contextmanager
+import itertools
+import queue
+import threading
+import time
+
+from src.utils import lazy_import
+
+cv2 = lazy_import('cv2')
+np = lazy_import('numpy')
+
+
+_T = TypeVar('_T')
+
+# sentinel marking the end of a queue's items
+_END = object()
+
+
+class ThroughputCounter:
+    """ Accumulates the number of frames processed by a stage as well as the time the
+        latter spent on it, excluding the time spent on waiting for adjacent stages, thus
+        quantifying the throughput the stage would be capable of on its own """
+
+    def __init__(self, stage: str):
+        self.stage: str = stage
+        self.n_frames: int = 0
+        self.seconds: float = 0.
+
+    @property
+    def fps(self) -> float:
+        return self.n_frames / self.seconds if self.seconds else float('inf')
+
+    def __str__(self):
+        return f'{self.stage}: {self.n_frames} frames in {self.seconds:.2f}s ({self.fps:.1f} fps)'
+
+
+class Pipeline:
+    """ Decode -> analyze -> encode pipeline, running decoding and encoding on threads of
+        their own which are connected to the consuming stage by bounded, order preserving
+        queues if threaded, such that the frame rate of two overlapping stages approaches
+        the one of the slower instead of their sum, whilst memory consumption is bounded by
+        the queue size; OpenCV releases the GIL during decoding, encoding and most image
+        operations, hence enabling the stages to truly overlap
+
+        As the output fps depend on the number of maintained frames, the stages merely
+        overlap in pairs: decoding with the analysis throughout the analysis pass, and
+        decoding with encoding throughout the streaming mode's write pass, whereas frames
+        having been held in memory are encoded on the calling thread, there being nothing
+        to overlap the encoding with
+
+        Records the throughput of each stage either way """
+
+    STAGES = ('decode', 'analysis', 'encode')
+
+    def __init__(self, threaded=False, queue_size=32):
+        """ Args:
+                threaded: run decoding and encoding on threads of their own
+                queue_size: maximal number of frames buffered between two stages """
+
+        self.threaded: bool = threaded
+        self.queue_size: int = queue_size
+        self.counters: Dict[str, ThroughputCounter] = {stage: ThroughputCounter(stage) for stage in self.STAGES}
+
+    @contextmanager
+    def timed(self, stage: str, n_frames=1):
+        """ Adds the duration of the enclosed block as well as n_frames to the counter of stage """
+
+        start = time.perf_counter()
+        yield
+        counter = self.counters[stage]
+        counter.seconds += time.perf_counter() - start
+        counter.n_frames += n_frames
+
+    def decoded(self, frames: Iterator[np.ndarray], frame_indices: Optional[Iterable[int]] = None) -> Iterator[np.ndarray]:
+        """ Args:
+                frames: lazily decoded frames
+                frame_indices: ascending video indices of frames if they're a selection, such
+                    that the skipped frames, whose grabbing is included in the decoding time,
+                    are being counted as well
+
+            Yields:
+                frames in order, being decoded on a separate thread if threaded """
+
+        def timed_frames() -> Iterator[np.ndarray]:
+            previous_frame_index = -1
+            for frame_index in itertools.count() if frame_indices is None else frame_indices:
+                with self.timed('decode', n_frames=0):
+                    frame = next(frames, _END)
+                if frame is _END:
+                    return
+
+                self.counters['decode'].n_frames += frame_index - previous_frame_index
+                previous_frame_index = frame_index
+                yield frame
+
+        if not self.threaded:
+            return timed_frames()
+        return _threaded(timed_frames(), self.queue_size)
+
+    def writer(self, video_writer: cv2.VideoWriter, overlapping=True) -> 'PipelineWriter':
+        """ Args:
+                overlapping: whether the written frames are being produced concurrently,
+                    encoding being run on a thread of its own merely if so and threaded """
+
+        return PipelineWriter(video_writer, self, threaded=self.threaded and overlapping)
+
+    def report(self):
+        for counter in self.counters.values():
+            if counter.n_frames:
+                print(counter)
+
+
+class PipelineWriter:
+    """ Wraps cv2.VideoWriter, encoding the written frames on a separate thread if threaded """
+
+    def __init__(self, video_writer: cv2.VideoWriter, pipeline: Pipeline, threaded: bool):
+        self._video_writer: cv2.VideoWriter = video_writer
+        self._pipeline: Pipeline = pipeline
+        self._exception: Optional[BaseException] = None
+
+        self._queue: Optional[queue.Queue] = None
+        if threaded:
+            self._queue = queue.Queue(maxsize=pipeline.queue_size)
+            self._thread = threading.Thread(target=self._consume, daemon=True)
+            self._thread.start()
+
+    def _encode(self, frame: np.ndarray):
+        with self._pipeline.timed('encode'):
+            self._video_writer.write(frame)
+
+    def _consume(self):
+        for frame in _queued_items(self._queue):
+            if self._exception is not None:
+                # keep draining queue in order to not block producer
+                continue
+
+            try:
+                self._encode(frame)
+            except BaseException as exception:
+                self._exception = exception
+
+    def write(self, frame: np.ndarray):
+        if self._queue is None:
+            self._encode(frame)
+        else:
+            self._queue.put(frame)
+
+    def release(self):
+        """ Waits for all written frames to be encoded and releases the video writer """
+
+        if self._queue is not None:
+            self._queue.put(_END)
+            self._thread.join()
+
+        self._video_writer.release()
+
+        if self._exception is not None:
+            raise self._exception
+
+
+def _threaded(items: Iterator[_T], queue_size: int) -> Iterator[_T]:
+    """ Produces items on a separate daemon thread, buffering at most queue_size of them
+
+        Yields:
+            items in order, exceptions raised whilst producing them being reraised """
+
+    buffer = queue.Queue(maxsize=queue_size)
+
+    def produce():
+        try:
+            for item in items:
+                buffer.put(item)
+        except BaseException as exception:
+            buffer.put(_ProducerException(exception))
+        buffer.put(_END)
+
+    threading.Thread(target=produce, daemon=True).start()
+
+    for item in _queued_items(buffer):
+        if isinstance(item, _ProducerException):
+            raise item.exception
+        yield item
+
+
+def _queued_items(buffer: queue.Queue) -> Iterator:
+    """ Yields:
+            items retrieved from buffer until the end sentinel, being compared by
+            identity since frames don't support equality comparisons """
+
+    while True:
+        item = buffer.get()
+        if item is _END:
+            return
+        yield item
+
+
+class _ProducerException:
+    def __init__(self, exception: BaseException):
+        self.exception: BaseException = exception
@@ -0,0 +1,71 @@
+""" Persists the rate of change of each frame with respect to its predecessor in a sidecar
+    file next to the video, enabling the re-tuning of the threshold without any decoding
+
+    Unlike the rate of change with respect to the last distinct frame, the one with respect
+    to the predecessor doesn't depend on the threshold, which is why the frame selection
+    based on the sidecar maintains each frame whose consecutive rate of change reaches the
+    threshold. The selection is hence identical to the one of the analysis pass of a
+    consecutive detector, whereas it may differ arbitrarily from the one of a detector
+    comparing against the last distinct frame, as the latter accumulates gradual changes
+    which the consecutive rates of change don't reflect """
+
+from __future__ import annotations
+
+from typing import List, Optional
+import os
+
+from src.video_lag_stripper._change_detection import ChangeDetector
+from src.utils import lazy_import
+
+np = lazy_import('numpy')
+
+
+SUFFIX = '.scores.npz'
+
+
+def sidecar_path(video_path: str) -> str:
+    return video_path + SUFFIX
+
+
+def is_sidecar(path: str) -> bool:
+    return path.endswith(SUFFIX)
+
+
+def _key(video_path: str, detector: ChangeDetector) -> np.ndarray:
+    """ Returns:
+            video file size and modification time, as well as the detector settings affecting
+            the rate of change, i.e. all but the threshold """
+
+    stat = os.stat(video_path)
+    return np.array([stat.st_size, stat.st_mtime_ns, detector.scale, detector.tolerance, detector.block_size or 0, detector.area_averaging], dtype=np.float64)
+
+
+def load_scores(video_path: str, detector: ChangeDetector) -> Optional[np.ndarray]:
+    """ Returns:
+            float32 consecutive rates of change of shape (n_frames, ) if a sidecar of matching
+            video file and detector settings is existent, None otherwise """
+
+    try:
+        with np.load(sidecar_path(video_path)) as sidecar:
+            if np.array_equal(sidecar['key'], _key(video_path, detector)):
+                return sidecar['scores']
+    except (OSError, KeyError, ValueError):
+        pass
+    return None
+
+
+def save_scores(video_path: str, detector: ChangeDetector, scores: List[float]):
+    with open(sidecar_path(video_path), 'wb') as f:
+        np.savez(f, key=_key(video_path, detector), scores=np.array(scores, dtype=np.float32))
+
+
+def distinct_frame_indices_from_scores(scores: np.ndarray, min_rate_of_change: float) -> List[int]:
+    """ Returns:
+            indices of the first frame as well as of every one whose rate of change with
+            respect to its predecessor reaches min_rate_of_change
+
+        >>> distinct_frame_indices_from_scores(np.array([np.inf, 0.1, 0.5, 0.2], dtype=np.float32), 0.2)
+        [0, 2, 3]
+        """
+
+    return np.flatnonzero(scores >= np.float32(min_rate_of_change)).tolist()
@@ -0,0 +1,121 @@
+""" Segment-parallel determination of the distinct frames of long videos
+
+    The frame range is split into segments, each of which is being analyzed by a worker
+    process of its own under the speculative assumption of the frame preceding the segment
+    being the last distinct one. Stitching the segments in order, a segment's speculative
+    result is exact if its preceding frame did turn out to be distinct; otherwise the
+    segment is being reanalyzed sequentially with respect to the actual last distinct frame
+    until both analyses maintain the same frame, from which on they coincide, as the
+    decision regarding a frame depends solely on the last distinct one. The speculative
+    results of a consecutive detector, comparing against the preceding frame, are always
+    exact. The result is thus
+    identical to the one of the sequential analysis, given that the capture backend seeks
+    frame-accurately, as FFmpeg's does """
+
+from __future__ import annotations
+
+from typing import List, Optional, Set, Tuple
+from concurrent.futures import ProcessPoolExecutor
+import itertools
+
+from src.video_lag_stripper import read_frames
+from src.video_lag_stripper._change_detection import ChangeDetector
+from src.utils import lazy_import
+
+cv2 = lazy_import('cv2')
+np = lazy_import('numpy')
+
+
+_Segment = Tuple[int, Optional[int]]
+
+
+def segment_parallel_distinct_frame_indices(file_path: str, n_frames_original: int, detector: ChangeDetector, n_workers: int) -> List[int]:
+    """ Args:
+            n_frames_original: possibly inexact number of frames as reported by the
+                capture, the last segment being read until the end of the video regardless
+            n_workers: number of worker processes, as well as of segments
+
+        Returns:
+            ascending indices of the frames which would be maintained by
+            consecutive_frames_of_insufficient_rate_of_change_stripped """
+
+    from tqdm import tqdm
+
+    segments = _segments(n_frames_original, n_workers)
+
+    with ProcessPoolExecutor(n_workers) as executor:
+        speculative_results = list(tqdm(
+            executor.map(_analyze, *zip(*((file_path, start - 1, start, stop, detector) for start, stop in segments))),
+            total=len(segments),
+            desc='Analyzing segments'
+        ))
+
+    # stitch segments, reanalyzing the ones whose speculative last distinct frame turned out wrong
+    distinct_frame_indices = [0]
+    for (start, stop), speculative_indices in zip(segments, speculative_results):
+        last_distinct_frame_index = distinct_frame_indices[-1]
+
+        # a consecutive detector's decisions don't depend on the last distinct frame
+        if last_distinct_frame_index == start - 1 or detector.consecutive:
+            distinct_frame_indices += speculative_indices
+        else:
+            distinct_frame_indices += _analyze(file_path, last_distinct_frame_index, start, stop, detector, speculative_indices=speculative_indices)
+
+    return distinct_frame_indices
+
+
+def _segments(n_frames: int, n_segments: int) -> List[_Segment]:
+    """ Splits the frames following the first one, which is distinct by definition, into
+        n_segments (start, stop) ranges of equal length, the last one being open-ended
+
+        >>> _segments(10, 3)
+        [(1, 4), (4, 7), (7, None)]
+        """
+
+    boundaries = sorted(set(np.linspace(1, max(n_frames, 1), n_segments + 1).astype(int).tolist()))[:-1] or [1]
+    return list(zip(boundaries, boundaries[1:] + [None]))
+
+
+def _analyze(file_path: str, reference_index: int, start: int, stop: Optional[int], detector: ChangeDetector, speculative_indices: Optional[List[int]] = None) -> List[int]:
+    """ Determines the distinct frames within [start, stop) given the frame at reference_index
+        being the last distinct one preceding start
+
+        Args:
+            speculative_indices: distinct frame indices of the segment determined with respect
+                to another reference frame; the analysis is being stopped as soon as it
+                coincides with them, the remaining ones being adopted
+
+        Returns:
+            ascending distinct frame indices within [start, stop) """
+
+    video_capture = cv2.VideoCapture(file_path)
+    speculative_index_set: Set[int] = set(speculative_indices or ())
+
+    try:
+        video_capture.set(cv2.CAP_PROP_POS_FRAMES, reference_index)
+        success, reference_frame = video_capture.read()
+        if not success:
+            return []
+        last_distinct_frame = detector.prepare(reference_frame)
+
+        if start != reference_index + 1:
+            video_capture.set(cv2.CAP_PROP_POS_FRAMES, start)
+
+        distinct_frame_indices = []
+        frames = itertools.islice(read_frames(video_capture), None if stop is None else stop - start)
+        for i, frame in enumerate(frames, start=start):
+            prepared_frame = detector.prepare(frame)
+
+            if detector.is_distinct(prepared_frame, last_distinct_frame):
+                last_distinct_frame = prepared_frame
+                distinct_frame_indices.append(i)
+
+                if i in speculative_index_set:
+                    return distinct_frame_indices + [index for index in speculative_indices if index > i]
+            elif detector.consecutive:
+                last_distinct_frame = prepared_frame
+
+        return distinct_frame_indices
+    finally:
+        video_capture.release()
+